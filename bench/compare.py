@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compare two bench/run.py result files and flag regressions.
+
+    python bench/compare.py bench/results/20250101-120000.json bench/baseline.json --threshold 0.15
+
+A metric regresses when it is more than `threshold` (relative) worse than the
+baseline and also worse by at least `--min-delta-ms`, so sub-millisecond noise
+on fast endpoints does not fail a run. Exits 1 if anything regressed.
+"""
+
+import sys
+import json
+import argparse
+
+LATENCY_METRICS = ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(current, baseline, threshold, min_delta_ms=0.5):
+    """[(mode, endpoint, metric, baseline_value, current_value), ...] for every regression"""
+    regressions = []
+    for mode, endpoints in current["results"].items():
+        for endpoint, result in endpoints.items():
+            base = baseline.get("results", {}).get(mode, {}).get(endpoint)
+            if base is None:
+                continue
+            for metric in LATENCY_METRICS:
+                old, new = base.get(metric), result.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old >= min_delta_ms:
+                    regressions.append((mode, endpoint, metric, old, new))
+            old_rate = base["errors"] / base["requests"] if base.get("requests") else 0.0
+            new_rate = result["errors"] / result["requests"] if result.get("requests") else 0.0
+            if new_rate > old_rate + 0.01:
+                regressions.append((mode, endpoint, "error_rate", round(old_rate, 4), round(new_rate, 4)))
+    return regressions
+
+
+def print_comparison(current, baseline, regressions):
+    print(f"Baseline: {baseline['meta'].get('commit')} at {baseline['meta'].get('timestamp')}")
+    print(f"Current:  {current['meta'].get('commit')} at {current['meta'].get('timestamp')}")
+    for mode, endpoints in current["results"].items():
+        for endpoint, result in endpoints.items():
+            base = baseline.get("results", {}).get(mode, {}).get(endpoint)
+            if base is None:
+                print(f"  {mode:<10} {endpoint:<20} (not in baseline)")
+                continue
+            changes = "  ".join(
+                f"{m} {base[m]:.2f}->{result[m]:.2f} ({(result[m] / base[m] - 1) * 100 if base[m] else 0:+.0f}%)"
+                for m in ("p50_ms", "p95_ms")
+            )
+            print(f"  {mode:<10} {endpoint:<20} {changes}")
+    if regressions:
+        print("\nREGRESSIONS:")
+        for mode, endpoint, metric, old, new in regressions:
+            print(f"  {mode} {endpoint} {metric}: {old} -> {new}")
+    else:
+        print("\nNo regressions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare benchmark results against a baseline")
+    parser.add_argument("current")
+    parser.add_argument("baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    with open(args.current) as f:
+        current = json.load(f)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold, args.min_delta_ms)
+    print_comparison(current, baseline, regressions)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
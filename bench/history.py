@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Query latency of the transactions read paths as history grows.
+
+    python bench/seed.py --transactions 1000000 --customers 20000
+    python bench/history.py --steps 4 --months-per-step 6 --rows-per-month 500000
+
+Each step adds --months-per-step months of older history (--rows-per-month
+rows per month, each month in its own partition) behind the seeded data and
+then times the service's transaction queries against it: first and later
+pages of GET /api/transactions (overall and per customer), a lookup by ID,
+and the last-hour GROUP BY behind /api/stats. The SQL matches app.py,
+including the created_at bounds that let Postgres prune partitions, so
+latency should stay flat while the row count grows. The exception is a
+customer page that has to reach back past the current month; it still
+visits every older partition.
+
+History rows are txn_h<YYYYMM>_<n>; months already present are skipped, so
+re-running only adds what is missing. Results are written as JSON to
+bench/results/.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timezone
+
+import psycopg2
+
+from run import DEFAULT_DATABASE_URL, RESULTS_DIR, git_commit, percentile
+
+LIST_COLUMNS = "transaction_id, customer_id, amount, currency, transaction_type, status, fraud_check_status, created_at"
+PAGE_SIZE = 20
+ORDER = "ORDER BY created_at DESC, transaction_id DESC"
+
+# GET /api/transactions pages: WHERE conditions, run the way list_transactions runs them
+PAGES = {
+    "list_first_page": [],
+    "list_next_page": ["created_at <= %(ts)s AND (created_at, transaction_id) < (%(ts)s, %(tid)s)"],
+    "customer_first_page": ["customer_id = %(cid)s"],
+}
+
+# get_transaction reads the ID's created_at from transaction_ids first, then the row from its partition
+ID_CREATED_AT = "SELECT created_at FROM transaction_ids WHERE transaction_id = %(tid)s"
+TRANSACTION_BY_ID = (f"SELECT {LIST_COLUMNS}, metadata FROM transactions "
+                     "WHERE transaction_id = %(tid)s AND created_at = %(created)s")
+
+QUERIES = {
+    "stats_last_hour": """
+        SELECT FLOOR(EXTRACT(EPOCH FROM (NOW()::timestamp - created_at)) / 60)::int AS minutes_ago,
+               status, COUNT(*)
+        FROM transactions
+        WHERE created_at > NOW() - INTERVAL '1 hour'
+        GROUP BY minutes_ago, status
+    """,
+}
+
+
+def add_history(conn, months_back, rows_per_month, customers):
+    """Fill the month `months_back` months before the current one; no-op if it already has history rows"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT date_trunc('month', LOCALTIMESTAMP) - make_interval(months => %s)", (months_back,))
+        month_start = cur.fetchone()[0]
+        prefix = f"txn_h{month_start:%Y%m}_"
+        cur.execute("SELECT create_transaction_partitions(%s, %s + INTERVAL '1 month')", (month_start, month_start))
+        cur.execute("SELECT 1 FROM transactions WHERE transaction_id = %s AND created_at >= %s "
+                    "AND created_at < %s + INTERVAL '1 month'", (prefix + "1", month_start, month_start))
+        if cur.fetchone() is not None:
+            conn.commit()
+            return False
+        cur.execute("""
+            INSERT INTO transactions (transaction_id, customer_id, amount, currency, transaction_type,
+                                      status, fraud_check_status, created_at)
+            SELECT %(prefix)s || g,
+                   'cust_b' || ((g::bigint * 7919) %% %(customers)s + 1),
+                   5 + (g %% 500), 'USD',
+                   CASE WHEN g %% 10 = 0 THEN 'refund' ELSE 'payment' END,
+                   CASE WHEN g %% 50 = 0 THEN 'failed' ELSE 'success' END,
+                   CASE WHEN g %% 10 = 0 THEN 'skipped' ELSE 'passed' END,
+                   %(start)s + (g::float / %(rows)s) * INTERVAL '28 days'
+            FROM generate_series(1, %(rows)s) g
+        """, {"prefix": prefix, "customers": customers, "start": month_start, "rows": rows_per_month})
+    conn.commit()
+    return True
+
+
+def fetch_page(cur, conditions, params):
+    """Page's own month first, then older months only if the page is not full yet"""
+    def query(extra, limit):
+        cur.execute(f"SELECT {LIST_COLUMNS} FROM transactions WHERE {' AND '.join(conditions + [extra])} "
+                    f"{ORDER} LIMIT {limit}", params)
+        return cur.fetchall()
+
+    rows = query("created_at >= %(window_start)s", PAGE_SIZE + 1)
+    if len(rows) <= PAGE_SIZE:
+        rows += query("created_at < %(window_start)s", PAGE_SIZE + 1 - len(rows))
+    return rows
+
+
+def time_queries(conn, samples, seed):
+    """
+    {query: {"p50_ms", "p95_ms"}} over `samples` runs of each. Parameters are
+    drawn per run from the last day's transactions and their customers.
+    """
+    rng = random.Random(seed)
+    with conn.cursor() as cur:
+        cur.execute("SELECT transaction_id, created_at, customer_id FROM transactions "
+                    f"WHERE created_at > LOCALTIMESTAMP - INTERVAL '1 day' {ORDER} LIMIT 1000")
+        recent = cur.fetchall()
+    if not recent:
+        raise RuntimeError("No transactions in the last day; run bench/seed.py first")
+
+    def params():
+        tid, ts, cid = rng.choice(recent)
+        return {"ts": ts, "tid": tid, "cid": cid,
+                "window_start": ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)}
+
+    def run_query(sql):
+        return lambda cur, p: (cur.execute(sql, p), cur.fetchall())
+
+    def run_page(conditions):
+        return lambda cur, p: fetch_page(cur, conditions, p)
+
+    def get_transaction(cur, p):
+        cur.execute(ID_CREATED_AT, p)
+        cur.execute(TRANSACTION_BY_ID, dict(p, created=cur.fetchone()[0]))
+        return cur.fetchall()
+
+    runners = {name: run_page(conditions) for name, conditions in PAGES.items()}
+    runners["get_transaction"] = get_transaction
+    runners.update((name, run_query(sql)) for name, sql in QUERIES.items())
+
+    results = {}
+    with conn.cursor() as cur:
+        for name, run in runners.items():
+            latencies = []
+            for _ in range(samples):
+                p = params()
+                start = time.perf_counter()
+                run(cur, p)
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            results[name] = {"p50_ms": round(percentile(latencies, 50), 3),
+                             "p95_ms": round(percentile(latencies, 95), 3)}
+    conn.rollback()
+    return results
+
+
+def table_size(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM transactions")
+        rows = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'transactions'::regclass")
+        partitions = cur.fetchone()[0]
+    return rows, partitions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Transaction query latency as history grows")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL", DEFAULT_DATABASE_URL))
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--months-per-step", type=int, default=6)
+    parser.add_argument("--rows-per-month", type=int, default=500_000)
+    parser.add_argument("--customers", type=int, default=20_000, help="as passed to seed.py")
+    parser.add_argument("--samples", type=int, default=200, help="timed runs per query and step")
+    parser.add_argument("--output", help="results file (default: bench/results/history-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(args.database_url)
+    steps = []
+    try:
+        for step in range(args.steps + 1):
+            if step:
+                began = time.perf_counter()
+                for months_back in range((step - 1) * args.months_per_step + 1, step * args.months_per_step + 1):
+                    add_history(conn, months_back, args.rows_per_month, args.customers)
+                with conn.cursor() as cur:
+                    conn.autocommit = True
+                    cur.execute("ANALYZE transactions")
+                    conn.autocommit = False
+                print(f"Added history up to {step * args.months_per_step} months back "
+                      f"in {time.perf_counter() - began:.0f}s")
+            rows, partitions = table_size(conn)
+            results = time_queries(conn, args.samples, seed=step)
+            steps.append({"rows": rows, "partitions": partitions, "queries": results})
+            print(f"{rows:>12,} rows {partitions:>3} partitions  " + "  ".join(
+                f"{name} {r['p50_ms']:.2f}/{r['p95_ms']:.2f}" for name, r in results.items()))
+    finally:
+        conn.close()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "rows_per_month": args.rows_per_month,
+            "months_per_step": args.months_per_step,
+            "samples": args.samples,
+        },
+        "steps": steps,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, "history-" + datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"p50/p95 ms per query. Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
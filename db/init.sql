@@ -10,18 +10,117 @@ CREATE TABLE IF NOT EXISTS customers (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Range-partitioned by month on created_at (partitions are transactions_pYYYYMM). The primary key
+-- has to include the partition key, so transaction_ids below keeps transaction IDs unique.
 CREATE TABLE IF NOT EXISTS transactions (
-    transaction_id VARCHAR(50) PRIMARY KEY,
+    transaction_id VARCHAR(50) NOT NULL,
     customer_id VARCHAR(50) REFERENCES customers(customer_id),
     amount DECIMAL(10, 2) NOT NULL,
     currency VARCHAR(3) DEFAULT 'USD',
     transaction_type VARCHAR(20) NOT NULL, -- 'payment', 'refund', 'transfer'
     status VARCHAR(20) NOT NULL, -- 'success', 'failed', 'pending'
     fraud_check_status VARCHAR(20), -- 'passed', 'failed', 'skipped', 'unavailable'
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    metadata JSONB
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    metadata JSONB,
+    PRIMARY KEY (transaction_id, created_at)
+) PARTITION BY RANGE (created_at);
+-- Catches rows for months without a partition; create_transaction_partitions moves them out
+CREATE TABLE IF NOT EXISTS transactions_default PARTITION OF transactions DEFAULT;
+
+-- Every transaction ID once, with its created_at: a duplicate ID fails the INSERT into
+-- transactions, and a lookup by ID can go straight to the partition holding it. IDs of
+-- detached partitions stay here, so they are never reused.
+CREATE TABLE IF NOT EXISTS transaction_ids (
+    transaction_id VARCHAR(50) PRIMARY KEY,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION record_transaction_ids() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO transaction_ids (transaction_id, created_at) SELECT transaction_id, created_at FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Once per statement, so a multi-row INSERT costs one extra INSERT, not one per row
+CREATE TRIGGER transactions_record_ids
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_transaction_ids();
+
+-- One row per refunded payment, keyed on the original transaction ID: a second refund of the same
+-- payment conflicts here. Written in the same commit as the refund's transactions row.
+CREATE TABLE IF NOT EXISTS refunds (
+    transaction_id VARCHAR(50) PRIMARY KEY,
+    refund_id VARCHAR(50) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The /api/stats counts, recounted by one service process at a time for all of them. One row.
+CREATE TABLE IF NOT EXISTS stats_snapshot (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    total_transactions BIGINT NOT NULL,
+    total_customers BIGINT NOT NULL,
+    minutes JSONB NOT NULL, -- {minute since the epoch: {status: count}} for the trailing hour
+    computed_at TIMESTAMP NOT NULL -- UTC
 );
 
+-- Create the monthly partitions covering [p_from, p_to) that do not exist yet. Returns how many
+-- were created. The service's partition maintainer calls this to keep partitions ahead of time.
+CREATE OR REPLACE FUNCTION create_transaction_partitions(p_from TIMESTAMP, p_to TIMESTAMP) RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', p_from);
+    month_end TIMESTAMP;
+    part_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start < p_to LOOP
+        month_end := month_start + INTERVAL '1 month';
+        part_name := 'transactions_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(part_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM transactions_default WHERE created_at >= month_start AND created_at < month_end) THEN
+                -- Rows arrived before their partition existed: move them out of the default partition
+                EXECUTE format('CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+                EXECUTE format('WITH moved AS (DELETE FROM transactions_default WHERE created_at >= $1 AND created_at < $2 RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM moved', part_name) USING month_start, month_end;
+                EXECUTE format('ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               part_name, month_start, month_end);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                               part_name, month_start, month_end);
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach every monthly partition that ends on or before p_before. Detached partitions stay as
+-- ordinary tables for archiving; nothing is dropped. Returns how many were detached.
+CREATE OR REPLACE FUNCTION detach_transaction_partitions(p_before TIMESTAMP) RETURNS INTEGER AS $$
+DECLARE
+    part_name TEXT;
+    detached INTEGER := 0;
+BEGIN
+    FOR part_name IN
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass AND c.relname ~ '^transactions_p[0-9]{6}$'
+        ORDER BY c.relname
+    LOOP
+        IF to_date(substr(part_name, 15), 'YYYYMM') + INTERVAL '1 month' <= p_before THEN
+            EXECUTE format('ALTER TABLE transactions DETACH PARTITION %I', part_name);
+            detached := detached + 1;
+        END IF;
+    END LOOP;
+    RETURN detached;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_transaction_partitions(date_trunc('month', LOCALTIMESTAMP) - INTERVAL '1 month',
+                                     LOCALTIMESTAMP + INTERVAL '3 months');
+
 CREATE TABLE IF NOT EXISTS payment_methods (
     payment_method_id VARCHAR(50) PRIMARY KEY,
     customer_id VARCHAR(50) REFERENCES customers(customer_id),
@@ -42,6 +141,26 @@ CREATE TABLE IF NOT EXISTS account_balances (
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Append-only balance deltas (negative for payments, positive for refunds), folded into
+-- account_balances and customers.account_balance by the service's ledger compactor
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    entry_id BIGSERIAL PRIMARY KEY,
+    transaction_id VARCHAR(50) NOT NULL,
+    customer_id VARCHAR(50) NOT NULL,
+    amount_delta DECIMAL(12, 2) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Payment gateway webhook events, de-duplicated on the gateway's event id
+CREATE TABLE IF NOT EXISTS gateway_events (
+    event_id VARCHAR(100) PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    transaction_id VARCHAR(50),
+    payload JSONB NOT NULL,
+    received_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Insert sample data
 INSERT INTO customers (customer_id, name, email, account_balance, status) VALUES
     ('cust_001', 'Alice Johnson', 'alice@example.com', 1250.00, 'active'),
@@ -66,7 +185,7 @@ INSERT INTO transactions (transaction_id, customer_id, amount, currency, transac
     ('txn_003', 'cust_003', 75.50, 'USD', 'payment', 'success', 'passed', NOW() - INTERVAL '45 minutes'),
     ('txn_004', 'cust_001', 50.00, 'USD', 'refund', 'success', 'skipped', NOW() - INTERVAL '30 minutes'),
     ('txn_005', 'cust_005', 1200.00, 'USD', 'payment', 'success', 'passed', NOW() - INTERVAL '25 minutes')
-ON CONFLICT (transaction_id) DO NOTHING;
+ON CONFLICT DO NOTHING;
 
 INSERT INTO account_balances (customer_id, balance, currency) VALUES
     ('cust_001', 1250.00, 'USD'),
@@ -79,11 +198,17 @@ INSERT INTO account_balances (customer_id, balance, currency) VALUES
 -- Create indexes for better query performance
 CREATE INDEX IF NOT EXISTS idx_transactions_customer_id ON transactions(customer_id);
 CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions(created_at DESC);
+-- Keyset pagination on (created_at, transaction_id), overall and per customer
+CREATE INDEX IF NOT EXISTS idx_transactions_created_at_id ON transactions(created_at DESC, transaction_id DESC);
+CREATE INDEX IF NOT EXISTS idx_transactions_customer_created_at_id ON transactions(customer_id, created_at DESC, transaction_id DESC);
 CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions(status);
 CREATE INDEX IF NOT EXISTS idx_payment_methods_customer_id ON payment_methods(customer_id);
 CREATE INDEX IF NOT EXISTS idx_account_balances_customer_id ON account_balances(customer_id);
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_customer_id ON balance_ledger(customer_id);
+CREATE INDEX IF NOT EXISTS idx_gateway_events_transaction_id ON gateway_events(transaction_id);
 
--- Create a view for transaction summaries
+-- Create a view for transaction summaries: current and previous month only, so the
+-- older partitions are not scanned
 CREATE OR REPLACE VIEW transaction_summary AS
 SELECT 
     t.transaction_id,
@@ -98,4 +223,5 @@ SELECT
     t.created_at
 FROM transactions t
 JOIN customers c ON t.customer_id = c.customer_id
+WHERE t.created_at >= date_trunc('month', LOCALTIMESTAMP) - INTERVAL '1 month'
 ORDER BY t.created_at DESC;
@@ -0,0 +1,9 @@
+-- Keyset pagination indexes for GET /api/transactions on databases created
+-- before they were added to init.sql. Safe to re-run.
+--
+--   docker exec -i payment-db psql -U paymentuser -d payments < db/migrations/001_transactions_keyset_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_created_at_id
+    ON transactions(created_at DESC, transaction_id DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_customer_created_at_id
+    ON transactions(customer_id, created_at DESC, transaction_id DESC);
@@ -0,0 +1,14 @@
+-- Table for payment gateway webhook events (POST /api/webhooks/payment-gateway)
+-- on databases created before it was added to init.sql. Safe to re-run.
+--
+--   docker exec -i payment-db psql -U paymentuser -d payments < db/migrations/002_gateway_events.sql
+
+CREATE TABLE IF NOT EXISTS gateway_events (
+    event_id VARCHAR(100) PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    transaction_id VARCHAR(50),
+    payload JSONB NOT NULL,
+    received_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_gateway_events_transaction_id ON gateway_events(transaction_id);
@@ -0,0 +1,14 @@
+-- Balance ledger for databases created before it was added to init.sql. Safe to re-run.
+-- Payments and refunds made before this migration never updated balances; only those
+-- made afterwards are reflected.
+--
+--   docker exec -i payment-db psql -U paymentuser -d payments < db/migrations/003_balance_ledger.sql
+
+CREATE TABLE IF NOT EXISTS balance_ledger (
+    entry_id BIGSERIAL PRIMARY KEY,
+    transaction_id VARCHAR(50) NOT NULL,
+    customer_id VARCHAR(50) NOT NULL,
+    amount_delta DECIMAL(12, 2) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_balance_ledger_customer_id ON balance_ledger(customer_id);
@@ -0,0 +1,139 @@
+-- Convert an existing, unpartitioned transactions table to the monthly range-partitioned layout
+-- in db/init.sql. Safe to re-run: the conversion is skipped once the table is partitioned.
+--
+-- The copy runs in one transaction and holds an exclusive lock on transactions throughout, so
+-- payments are blocked while it runs (roughly a minute per few million rows). Run it in a
+-- maintenance window with the payment processor stopped:
+--
+--   docker compose stop payment-processor
+--   docker exec -i payment-db psql -U paymentuser -d payments < db/migrations/004_partition_transactions.sql
+--   docker compose start payment-processor
+--
+-- The old table is kept as transactions_unpartitioned. Drop it once the new one is verified:
+--
+--   DROP TABLE transactions_unpartitioned;
+--
+-- After this migration, 001_transactions_keyset_indexes.sql must not be re-run: CREATE INDEX
+-- CONCURRENTLY is not supported on partitioned tables, and those indexes already exist.
+
+-- Create the monthly partitions covering [p_from, p_to) that do not exist yet. Returns how many
+-- were created. The service's partition maintainer calls this to keep partitions ahead of time.
+CREATE OR REPLACE FUNCTION create_transaction_partitions(p_from TIMESTAMP, p_to TIMESTAMP) RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', p_from);
+    month_end TIMESTAMP;
+    part_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start < p_to LOOP
+        month_end := month_start + INTERVAL '1 month';
+        part_name := 'transactions_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(part_name) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM transactions_default WHERE created_at >= month_start AND created_at < month_end) THEN
+                -- Rows arrived before their partition existed: move them out of the default partition
+                EXECUTE format('CREATE TABLE %I (LIKE transactions INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part_name);
+                EXECUTE format('WITH moved AS (DELETE FROM transactions_default WHERE created_at >= $1 AND created_at < $2 RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM moved', part_name) USING month_start, month_end;
+                EXECUTE format('ALTER TABLE transactions ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               part_name, month_start, month_end);
+            ELSE
+                EXECUTE format('CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                               part_name, month_start, month_end);
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detach every monthly partition that ends on or before p_before. Detached partitions stay as
+-- ordinary tables for archiving; nothing is dropped. Returns how many were detached.
+CREATE OR REPLACE FUNCTION detach_transaction_partitions(p_before TIMESTAMP) RETURNS INTEGER AS $$
+DECLARE
+    part_name TEXT;
+    detached INTEGER := 0;
+BEGIN
+    FOR part_name IN
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'transactions'::regclass AND c.relname ~ '^transactions_p[0-9]{6}$'
+        ORDER BY c.relname
+    LOOP
+        IF to_date(substr(part_name, 15), 'YYYYMM') + INTERVAL '1 month' <= p_before THEN
+            EXECUTE format('ALTER TABLE transactions DETACH PARTITION %I', part_name);
+            detached := detached + 1;
+        END IF;
+    END LOOP;
+    RETURN detached;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'transactions'::regclass) = 'p' THEN
+        RAISE NOTICE 'transactions is already partitioned';
+        RETURN;
+    END IF;
+
+    LOCK TABLE transactions IN ACCESS EXCLUSIVE MODE;
+    DROP VIEW IF EXISTS transaction_summary;
+    ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+    -- Index names are schema-wide; free them up for the new table
+    ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_pkey TO transactions_unpartitioned_pkey;
+    ALTER TABLE transactions_unpartitioned RENAME CONSTRAINT transactions_customer_id_fkey
+        TO transactions_unpartitioned_customer_id_fkey;
+    DROP INDEX IF EXISTS idx_transactions_customer_id, idx_transactions_created_at, idx_transactions_created_at_id,
+                         idx_transactions_customer_created_at_id, idx_transactions_status;
+
+    CREATE TABLE transactions (
+        transaction_id VARCHAR(50) NOT NULL,
+        customer_id VARCHAR(50) REFERENCES customers(customer_id),
+        amount DECIMAL(10, 2) NOT NULL,
+        currency VARCHAR(3) DEFAULT 'USD',
+        transaction_type VARCHAR(20) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        fraud_check_status VARCHAR(20),
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        metadata JSONB,
+        PRIMARY KEY (transaction_id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE transactions_default PARTITION OF transactions DEFAULT;
+
+    PERFORM create_transaction_partitions(
+        COALESCE((SELECT MIN(created_at) FROM transactions_unpartitioned), LOCALTIMESTAMP),
+        GREATEST((SELECT MAX(created_at) FROM transactions_unpartitioned), LOCALTIMESTAMP) + INTERVAL '3 months'
+    );
+
+    INSERT INTO transactions (transaction_id, customer_id, amount, currency, transaction_type, status,
+                              fraud_check_status, created_at, metadata)
+    SELECT transaction_id, customer_id, amount, currency, transaction_type, status,
+           fraud_check_status, COALESCE(created_at, LOCALTIMESTAMP), metadata
+    FROM transactions_unpartitioned;
+
+    -- Built after the copy, which is much faster than maintaining them row by row
+    CREATE INDEX idx_transactions_customer_id ON transactions(customer_id);
+    CREATE INDEX idx_transactions_created_at ON transactions(created_at DESC);
+    CREATE INDEX idx_transactions_created_at_id ON transactions(created_at DESC, transaction_id DESC);
+    CREATE INDEX idx_transactions_customer_created_at_id ON transactions(customer_id, created_at DESC, transaction_id DESC);
+    CREATE INDEX idx_transactions_status ON transactions(status);
+
+    CREATE VIEW transaction_summary AS
+    SELECT
+        t.transaction_id,
+        t.customer_id,
+        c.name as customer_name,
+        c.email as customer_email,
+        t.amount,
+        t.currency,
+        t.transaction_type,
+        t.status,
+        t.fraud_check_status,
+        t.created_at
+    FROM transactions t
+    JOIN customers c ON t.customer_id = c.customer_id
+    ORDER BY t.created_at DESC;
+END;
+$$;
+
+ANALYZE transactions;
@@ -0,0 +1,70 @@
+-- Enforce unique transaction IDs again on the partitioned transactions table, and bound
+-- transaction_summary to recent partitions. Safe to re-run.
+--
+-- The partitioned table's primary key is (transaction_id, created_at), so on its own it would
+-- accept the same ID twice with different timestamps. transaction_ids holds every ID once,
+-- filled by a statement trigger in the same transaction as the insert; a duplicate ID fails the
+-- whole INSERT. It also records each ID's created_at, which lets a lookup by ID go straight to
+-- the one partition holding it.
+--
+-- The backfill holds a SHARE lock on transactions, so writes wait while it runs (seconds per
+-- million rows). It fails, changing nothing, if transactions already holds a duplicate ID; find
+-- them with:
+--
+--   SELECT transaction_id, COUNT(*) FROM transactions GROUP BY transaction_id HAVING COUNT(*) > 1;
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS transaction_ids (
+    transaction_id VARCHAR(50) PRIMARY KEY,
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION record_transaction_ids() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO transaction_ids (transaction_id, created_at) SELECT transaction_id, created_at FROM new_rows;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+LOCK TABLE transactions IN SHARE MODE;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM transactions GROUP BY transaction_id HAVING COUNT(*) > 1) THEN
+        RAISE EXCEPTION 'transactions has duplicate transaction IDs; resolve them before applying this migration';
+    END IF;
+END;
+$$;
+
+INSERT INTO transaction_ids (transaction_id, created_at)
+SELECT transaction_id, created_at FROM transactions
+ON CONFLICT (transaction_id) DO NOTHING;
+
+DROP TRIGGER IF EXISTS transactions_record_ids ON transactions;
+CREATE TRIGGER transactions_record_ids
+    AFTER INSERT ON transactions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION record_transaction_ids();
+
+-- Current and previous month only; the partitions before them are not scanned
+CREATE OR REPLACE VIEW transaction_summary AS
+SELECT
+    t.transaction_id,
+    t.customer_id,
+    c.name as customer_name,
+    c.email as customer_email,
+    t.amount,
+    t.currency,
+    t.transaction_type,
+    t.status,
+    t.fraud_check_status,
+    t.created_at
+FROM transactions t
+JOIN customers c ON t.customer_id = c.customer_id
+WHERE t.created_at >= date_trunc('month', LOCALTIMESTAMP) - INTERVAL '1 month'
+ORDER BY t.created_at DESC;
+
+COMMIT;
+
+ANALYZE transaction_ids;
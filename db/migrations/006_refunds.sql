@@ -0,0 +1,12 @@
+-- Allow one refund per payment. Safe to re-run.
+--
+-- refunds holds the original transaction ID of every refund the service writes from now on, in
+-- the same commit as the refund row; a second refund of the same payment conflicts on its primary
+-- key. Refund rows written before this migration do not record which payment they refunded, so
+-- they are not backfilled: payments refunded before it can be refunded once more.
+
+CREATE TABLE IF NOT EXISTS refunds (
+    transaction_id VARCHAR(50) PRIMARY KEY,
+    refund_id VARCHAR(50) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
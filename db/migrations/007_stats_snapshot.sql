@@ -0,0 +1,13 @@
+-- Shared /api/stats counts. Safe to re-run.
+--
+-- One service process recounts transactions and customers per STATS_REFRESH_INTERVAL, under an
+-- advisory lock, and stores the result here; the others seed their counters from this row
+-- instead of each running the counting queries themselves.
+
+CREATE TABLE IF NOT EXISTS stats_snapshot (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    total_transactions BIGINT NOT NULL,
+    total_customers BIGINT NOT NULL,
+    minutes JSONB NOT NULL, -- {minute since the epoch: {status: count}} for the trailing hour
+    computed_at TIMESTAMP NOT NULL -- UTC
+);
@@ -0,0 +1,11 @@
+#!/bin/sh
+# Primary-side setup for the streaming replica in docker-compose.replica.yml.
+# Runs from docker-entrypoint-initdb.d, so only when the database volume is first created.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-EOSQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD '${REPLICATION_PASSWORD:-replicatorpass}';
+EOSQL
+
+# "all" in pg_hba.conf does not cover replication connections
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"
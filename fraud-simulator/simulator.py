@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the fraud verification API, for load tests and local runs.
+
+A minimal asyncio HTTP/1.1 server (standard library only, keep-alive, one
+process per core via SO_REUSEPORT) so it can serve thousands of requests per
+second and is never the bottleneck when benchmarking the payment path.
+Latency is simulated with asyncio.sleep, so slow responses cost no threads.
+
+    POST /verify   {"customer_id": ..., "amount": ...}  or  {"transaction_id": ..., "type": "refund"}
+    GET  /health
+
+Every behaviour is configured through FRAUD_SIM_* environment variables; see
+the runbook for the full list.
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import signal
+import asyncio
+import logging
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv('FRAUD_SIM_HOST', '0.0.0.0')
+PORT = int(os.getenv('FRAUD_SIM_PORT', '9000'))
+PROCESSES = int(os.getenv('FRAUD_SIM_PROCESSES', str(os.cpu_count() or 1)))
+
+# Latency: 'fixed' always takes LATENCY_MS; 'lognormal' has median LATENCY_MS and shape SIGMA
+LATENCY_MODEL = os.getenv('FRAUD_SIM_LATENCY', 'fixed').lower()
+LATENCY_MS = float(os.getenv('FRAUD_SIM_LATENCY_MS', '20'))
+LATENCY_SIGMA = float(os.getenv('FRAUD_SIM_LATENCY_SIGMA', '0.5'))
+# A fraction of requests take TAIL_MS instead (slow-tail injection)
+TAIL_RATE = float(os.getenv('FRAUD_SIM_TAIL_RATE', '0'))
+TAIL_MS = float(os.getenv('FRAUD_SIM_TAIL_MS', '1500'))
+
+# Failure injection, each a fraction of requests
+TIMEOUT_RATE = float(os.getenv('FRAUD_SIM_TIMEOUT_RATE', '0'))  # hold the request open, never answer
+HANG_SECONDS = float(os.getenv('FRAUD_SIM_HANG_SECONDS', '60'))
+RESET_RATE = float(os.getenv('FRAUD_SIM_RESET_RATE', '0'))  # drop the connection without a response
+ERROR_RATE = float(os.getenv('FRAUD_SIM_ERROR_RATE', '0'))  # answer with ERROR_STATUS
+ERROR_STATUS = int(os.getenv('FRAUD_SIM_ERROR_STATUS', '503'))
+
+# Verdict rules: payments above DECLINE_AMOUNT and anything for BLOCKED_CUSTOMERS is declined (403)
+DECLINE_AMOUNT = float(os.getenv('FRAUD_SIM_DECLINE_AMOUNT', '5000'))
+BLOCKED_CUSTOMERS = set(filter(None, os.getenv('FRAUD_SIM_BLOCKED_CUSTOMERS', '').split(',')))
+BLOCKED_TRANSACTIONS = set(filter(None, os.getenv('FRAUD_SIM_BLOCKED_TRANSACTIONS', '').split(',')))
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 500: "Internal Server Error",
+           502: "Bad Gateway", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+class BadRequest(Exception):
+    """A request that cannot be parsed; answered with 400 and the connection closed"""
+
+
+def sample_latency():
+    """Seconds to wait before answering"""
+    if TAIL_RATE and random.random() < TAIL_RATE:
+        return TAIL_MS / 1000
+    if LATENCY_MODEL == 'lognormal':
+        return random.lognormvariate(math.log(max(LATENCY_MS, 0.001)), LATENCY_SIGMA) / 1000
+    return LATENCY_MS / 1000
+
+
+def verdict(payload):
+    """(status_code, body) for a decoded verification request"""
+    if not isinstance(payload, dict):
+        return 400, {"error": "expected a JSON object"}
+    if payload.get("type") == "refund":
+        declined = payload.get("transaction_id") in BLOCKED_TRANSACTIONS
+    else:
+        try:
+            amount = float(payload.get("amount") or 0)
+        except (TypeError, ValueError):
+            return 400, {"error": "amount must be a number"}
+        declined = amount > DECLINE_AMOUNT or payload.get("customer_id") in BLOCKED_CUSTOMERS
+    if declined:
+        return 403, {"verdict": "fail", "score": round(random.uniform(0.8, 1.0), 3)}
+    return 200, {"verdict": "pass", "score": round(random.uniform(0.0, 0.2), 3)}
+
+
+def encode_response(status, body, keep_alive):
+    payload = json.dumps(body, separators=(',', ':')).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode() + payload
+
+
+async def read_request(reader):
+    """
+    (method, path, headers, body), or None once the client has gone away.
+    Raises BadRequest for a malformed request line or Content-Length.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        return None
+    lines = head.decode('latin-1').split("\r\n")
+    request_line = lines[0].split(" ")
+    if len(request_line) != 3:
+        raise BadRequest("malformed request line")
+    method, path, _ = request_line
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise BadRequest("invalid Content-Length")
+    if length < 0:
+        raise BadRequest("invalid Content-Length")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+async def handle_connection(reader, writer):
+    try:
+        while True:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+
+            if method == "GET" and path == "/health":
+                writer.write(encode_response(200, {"status": "ok"}, keep_alive))
+            elif method == "POST" and path.split("?", 1)[0] == "/verify":
+                roll = random.random()
+                if roll < RESET_RATE:
+                    writer.transport.abort()
+                    return
+                if roll < RESET_RATE + TIMEOUT_RATE:
+                    await asyncio.sleep(HANG_SECONDS)
+                    writer.transport.abort()
+                    return
+
+                await asyncio.sleep(sample_latency())
+                if roll < RESET_RATE + TIMEOUT_RATE + ERROR_RATE:
+                    status, response = ERROR_STATUS, {"error": "simulated failure"}
+                else:
+                    try:
+                        status, response = verdict(json.loads(body or b"{}"))
+                    except ValueError:
+                        status, response = 400, {"error": "invalid JSON"}
+                writer.write(encode_response(status, response, keep_alive))
+            else:
+                writer.write(encode_response(404, {"error": "not found"}, keep_alive))
+
+            await writer.drain()
+            if not keep_alive:
+                return
+    except BadRequest as e:
+        # The rest of the stream cannot be framed, so answer and close
+        writer.write(encode_response(400, {"error": str(e)}, False))
+        await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        return
+    finally:
+        if not writer.transport.is_closing():
+            writer.close()
+
+
+async def serve():
+    server = await asyncio.start_server(handle_connection, HOST, PORT, reuse_port=True, backlog=2048)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    logger.info(
+        f"Fraud simulator on {HOST}:{PORT} x{PROCESSES}: latency {LATENCY_MODEL} {LATENCY_MS:g}ms, "
+        f"tail {TAIL_RATE:g}@{TAIL_MS:g}ms, timeouts {TIMEOUT_RATE:g}, resets {RESET_RATE:g}, errors {ERROR_RATE:g}"
+    )
+    children = []
+    for _ in range(PROCESSES - 1):
+        pid = os.fork()
+        if pid == 0:
+            children = []
+            break
+        children.append(pid)
+    # As PID 1 in a container SIGTERM is otherwise ignored, with one process as much as with
+    # several; exit, and take any children down too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+
+if __name__ == "__main__":
+    main()
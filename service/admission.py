@@ -0,0 +1,168 @@
+"""
+Admission control: per-client token-bucket rate limits and per-route-group
+in-flight limits with load shedding.
+
+Both are checked before a request reaches its handler so that an overloaded
+route group (typically payments, stuck behind fraud API timeouts) is turned
+away in microseconds instead of tying up worker threads that cheap reads need.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is a hint in seconds"""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(f"{reason}, retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`. Not thread-safe."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self):
+        """0.0 if a token was taken, otherwise seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per (client, route). `per_minute` applies to every route
+    unless `route_limits` overrides it; a limit <= 0 means unlimited. Buckets
+    for the least recently seen clients are dropped beyond `max_buckets`.
+    """
+
+    def __init__(self, per_minute, burst, route_limits=None, max_buckets=10000):
+        self.per_minute = per_minute
+        self.burst = burst
+        self.route_limits = route_limits or {}
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, client, route):
+        """0.0 if the request may proceed, otherwise seconds to wait"""
+        limit = self.route_limits.get(route, self.per_minute)
+        if limit <= 0:
+            return 0.0
+        key = (client, route)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(limit / 60.0, max(self.burst, 1))
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take()
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+            return wait
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "per_minute": self.per_minute,
+                "burst": self.burst,
+                "route_limits": dict(self.route_limits),
+                "tracked_buckets": len(self._buckets),
+                "allowed": self.allowed,
+                "limited": self.limited,
+            }
+
+
+class ConcurrencyLimiter:
+    """
+    At most `max_in_flight` concurrent requests; 0 disables the limit.
+
+    A request arriving when the group is full waits, but only if the expected
+    queue wait (requests ahead of it x average service time / slots) fits in
+    `latency_budget` seconds. Otherwise, or if a slot does not free up within
+    the budget, it is rejected with Overloaded straight away.
+    """
+
+    def __init__(self, name, max_in_flight, latency_budget, initial_service_time=0.1):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.latency_budget = latency_budget
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        # Exponentially weighted moving average of request duration, seconds
+        self.avg_service_time = initial_service_time
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timeouts = 0
+
+    def estimated_wait(self):
+        return (self.waiting + 1) * self.avg_service_time / self.max_in_flight
+
+    def acquire(self):
+        if self.max_in_flight <= 0:
+            return
+        with self._cond:
+            if self.in_flight >= self.max_in_flight:
+                estimate = self.estimated_wait()
+                if estimate > self.latency_budget:
+                    self.shed += 1
+                    raise Overloaded(estimate, "in-flight limit reached")
+
+                self.queued += 1
+                self.waiting += 1
+                deadline = time.monotonic() + self.latency_budget
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.timeouts += 1
+                            raise Overloaded(self.estimated_wait(), "queue wait exceeded latency budget")
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self, duration):
+        if self.max_in_flight <= 0:
+            return
+        with self._cond:
+            self.in_flight -= 1
+            self.avg_service_time += 0.2 * (duration - self.avg_service_time)
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "latency_budget_ms": round(self.latency_budget * 1000, 1),
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "avg_service_ms": round(self.avg_service_time * 1000, 2),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "shed": self.shed,
+                "timeouts": self.timeouts,
+            }
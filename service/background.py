@@ -0,0 +1,56 @@
+"""
+Periodic background jobs.
+
+A BackgroundLoop runs one step of a component's work on a daemon thread
+every `interval` seconds until stopped. A step that raises is handed to
+`on_error` and tried again on the next tick, so a dependency that is down
+never kills the thread.
+
+Jobs that should run in one process at a time across workers and hosts take
+a Postgres transaction-level advisory lock first (pg_try_advisory_xact_lock)
+and skip the run if another process holds it. Their keys are kept here so
+they stay unique within the database.
+"""
+
+import threading
+
+# Arbitrary, but no two jobs may share one; each is its name's first four bytes in ASCII
+LEDGER_COMPACTION_LOCK_KEY = 0x6c656467  # 'ledg'
+PARTITION_MAINTENANCE_LOCK_KEY = 0x70617274  # 'part'
+STATS_RECOUNT_LOCK_KEY = 0x73746174  # 'stat'
+
+
+class BackgroundLoop:
+
+    def __init__(self, name, step, interval, on_error):
+        self.name = name
+        self.step = step
+        self.interval = interval
+        self.on_error = on_error
+        self._thread = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def stopping(self):
+        return self._stopping.is_set()
+
+    def start(self):
+        if not self.running:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.step()
+            except Exception as e:
+                self.on_error(e)
+            self._stopping.wait(self.interval)
@@ -0,0 +1,123 @@
+"""
+Bulkheads: bounded executors that isolate calls to a slow dependency.
+
+Calls run on the bulkhead's own threads, at most `max_concurrent` at a time
+with at most `max_queue` more waiting. Beyond that a call is rejected at once
+instead of queueing, and a caller never waits longer than `timeout` seconds
+for its result, so a hung dependency uses up the bulkhead's capacity rather
+than every request thread in the process.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+class BulkheadFull(Exception):
+    """The bulkhead already has max_concurrent calls running and max_queue waiting"""
+
+    def __init__(self, name):
+        super().__init__(f"Bulkhead '{name}' is full")
+        self.name = name
+
+
+class BulkheadTimeout(Exception):
+    """The call did not finish within the bulkhead timeout (it may still be running)"""
+
+    def __init__(self, name, timeout):
+        super().__init__(f"Bulkhead '{name}' call timed out after {timeout:.2f}s")
+        self.name = name
+        self.timeout = timeout
+
+
+class Bulkhead:
+
+    def __init__(self, name, max_concurrent, max_queue, timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+        self.pending = 0  # running + queued
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def _new_executor(self):
+        return ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix=f"bulkhead-{self.name}")
+
+    def reset(self):
+        """Start a fresh executor, e.g. in a freshly forked worker"""
+        with self._lock:
+            self._executor = self._new_executor()
+            self.pending = 0
+            self.active = 0
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the bulkhead and return its result.
+
+        Raises BulkheadFull when there is no room, BulkheadTimeout when the
+        result is not ready within `timeout`; fn's own exceptions propagate.
+        """
+        with self._lock:
+            if self.pending >= self.max_concurrent + self.max_queue:
+                self.rejected += 1
+                raise BulkheadFull(self.name)
+            self.pending += 1
+            self.submitted += 1
+
+        future = self._executor.submit(self._run, time.perf_counter(), fn, args, kwargs)
+        # Also fires when the call is cancelled before it starts
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            raise BulkheadTimeout(self.name, self.timeout) from None
+
+    def _run(self, queued_at, fn, args, kwargs):
+        waited = time.perf_counter() - queued_at
+        with self._lock:
+            self.active += 1
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+
+    def snapshot(self):
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.timeout,
+                "active": self.active,
+                "queue_depth": self.pending - self.active,
+                "utilisation": round(self.active / self.max_concurrent, 3) if self.max_concurrent else 0.0,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "queue_wait_avg_ms": round(self.queue_wait_total / started * 1000, 3) if started else 0.0,
+                "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+            }
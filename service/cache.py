@@ -0,0 +1,238 @@
+"""
+In-process caches.
+"""
+
+import sys
+import time
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+
+def approx_size(obj):
+    """Rough deep size in bytes of JSON-like values (dicts, lists, scalars)"""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(approx_size(v) for v in obj)
+    return size
+
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    All operations take a single lock; entries are (expires_at, value, size)
+    tuples kept in recency order so eviction pops from the front. Pass
+    `sizeof` (e.g. approx_size) to track the memory held by cached values.
+    """
+
+    def __init__(self, maxsize, ttl, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.bytes = 0
+
+    def get(self, key, default=MISSING):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+                self.bytes -= entry[2]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            old = self._data.get(key)
+            if old is not None:
+                self.bytes -= old[2]
+            self._data[key] = (expires_at, value, size)
+            self._data.move_to_end(key)
+            self.bytes += size
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= evicted[2]
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_bytes": self.bytes,
+            }
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReadThroughCache(TTLCache):
+    """
+    TTLCache that loads misses itself, with single-flight de-duplication:
+    concurrent misses for the same key share one loader call.
+
+    Loaders returning None (not found) are not cached. A value loaded while
+    invalidate() was called for its key is returned but not cached, so a write
+    that races a read cannot leave the pre-write row behind. Invalidating one
+    key does not affect loads of other keys.
+
+    Invalidation is local to this process: other workers keep serving their
+    copy for up to `ttl` seconds after a write.
+    """
+
+    def __init__(self, maxsize, ttl, sizeof=approx_size):
+        super().__init__(maxsize, ttl, sizeof=sizeof)
+        self._flights = {}
+        self._flight_lock = threading.Lock()
+        # key -> [loads in progress, generation], only while a load of key is in progress
+        self._loading = {}
+        self.coalesced = 0
+
+    def _begin_load(self, key):
+        """Register a load of key; returns the generation to pass to _end_load. Call under _flight_lock."""
+        entry = self._loading.get(key)
+        if entry is None:
+            entry = self._loading[key] = [0, 0]
+        entry[0] += 1
+        return entry[1]
+
+    def _end_load(self, key, generation):
+        """True if key was not invalidated since _begin_load. Call under _flight_lock."""
+        entry = self._loading[key]
+        entry[0] -= 1
+        if entry[0] == 0:
+            del self._loading[key]
+        return entry[1] == generation
+
+    def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        with self._flight_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generation = self._begin_load(key)
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flight_lock:
+                del self._flights[key]
+                current = self._end_load(key, generation)
+                if current and flight.error is None and flight.value is not None:
+                    self.set(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def get_many_or_load(self, keys, loader):
+        """
+        {key: value} for every key, loading all misses with one call to
+        loader(missing_keys), which returns {key: value} for the keys it
+        found. Keys absent from the result map to None and are not cached.
+        Batch loads are not coalesced with in-flight single-key loads.
+        """
+        values = {}
+        missing = []
+        for key in keys:
+            if key in values:
+                continue
+            value = self.get(key)
+            if value is MISSING:
+                missing.append(key)
+                values[key] = None
+            else:
+                values[key] = value
+        if not missing:
+            return values
+
+        with self._flight_lock:
+            generations = {key: self._begin_load(key) for key in missing}
+        try:
+            loaded = loader(missing)
+        except Exception:
+            with self._flight_lock:
+                for key in missing:
+                    self._end_load(key, generations[key])
+            raise
+        with self._flight_lock:
+            for key in missing:
+                value = loaded.get(key)
+                values[key] = value
+                if self._end_load(key, generations[key]) and value is not None:
+                    self.set(key, value)
+        return values
+
+    def invalidate(self, key):
+        with self._flight_lock:
+            entry = self._loading.get(key)
+            if entry is not None:
+                entry[1] += 1
+        super().invalidate(key)
+
+    def snapshot(self):
+        stats = super().snapshot()
+        stats["coalesced_loads"] = self.coalesced
+        return stats
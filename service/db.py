@@ -0,0 +1,125 @@
+"""
+Database engine construction and connection pool instrumentation.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+def build_engine(url, mode='queue', pool_size=10, max_overflow=10,
+                 pre_ping=True, recycle=1800, timeout=5.0):
+    """Create an engine for url; mode 'null' opens a new connection per checkout"""
+    if mode == 'null':
+        return create_engine(url, poolclass=NullPool)
+
+    return create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_pre_ping=pre_ping,
+        pool_recycle=recycle,
+        pool_timeout=timeout,
+    )
+
+
+def instrument_engine(engine, on_query):
+    """Call on_query(statement, seconds) after every statement engine executes"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start')
+        if starts:
+            on_query(statement, time.perf_counter() - starts.pop())
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        conn = context.connection
+        starts = conn.info.get('query_start') if conn is not None else None
+        if starts:
+            on_query(context.statement or "", time.perf_counter() - starts.pop())
+
+
+class PoolStats:
+    """Tracks how long requests wait to check out a connection"""
+
+    def __init__(self, observer=None):
+        # observer(wait_seconds, outcome) is told about every checkout attempt
+        self.observer = observer
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.checkout_errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait, outcome='ok'):
+        with self._lock:
+            if outcome == 'ok':
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+            elif outcome == 'timeout':
+                self.checkout_timeouts += 1
+            else:
+                self.checkout_errors += 1
+        if self.observer:
+            self.observer(wait, outcome)
+
+    def snapshot(self, engine):
+        pool = engine.pool if engine else None
+        with self._lock:
+            stats = {
+                "mode": "queue" if isinstance(pool, QueuePool) else "null",
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "checkout_errors": self.checkout_errors,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "timeout_seconds": pool.timeout(),
+            })
+        return stats
+
+
+def is_transient_error(error):
+    """
+    True for failures that say nothing about the statement itself: the
+    database unreachable or restarting, a dropped connection, a pool timeout.
+    Retrying the same write later can succeed.
+    """
+    if isinstance(error, (exc.OperationalError, exc.InterfaceError, exc.TimeoutError, exc.DisconnectionError)):
+        return True
+    return bool(getattr(error, 'connection_invalidated', False))
+
+
+@contextmanager
+def connect(engine, stats):
+    """engine.connect() that records checkout wait time and timeouts"""
+    start = time.perf_counter()
+    try:
+        conn = engine.connect()
+    except exc.TimeoutError:
+        stats.record(time.perf_counter() - start, 'timeout')
+        raise
+    except Exception:
+        stats.record(time.perf_counter() - start, 'error')
+        raise
+    stats.record(time.perf_counter() - start)
+
+    with conn:
+        yield conn
@@ -0,0 +1,226 @@
+"""
+Fraud verification API client.
+
+Keeps a pooled keep-alive session to the fraud API and wraps every call in a
+circuit breaker, so an unreachable fraud service costs one fast 503 instead of
+pinning a worker thread for the full timeout.
+"""
+
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the fraud API while the breaker is open"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Circuit open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open every call
+    is rejected; after `reset_timeout` seconds up to `half_open_calls` probe
+    calls are let through and the first result decides whether to close again.
+
+    before_call() returns a ticket to hand back to record_success() /
+    record_failure() and finally release(). The ticket carries the breaker's
+    generation at admission, bumped on every state change, so a slow call
+    admitted before the breaker opened cannot close it or reopen it later;
+    only the current half-open probes decide.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, half_open_calls=1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.times_opened = 0
+        self.generation = 0
+
+    def _set_state(self, state):
+        """Call with the lock held"""
+        self.state = state
+        self.generation += 1
+        self.probes_in_flight = 0
+
+    def _is_probe(self, ticket):
+        generation, probe = ticket
+        return probe and generation == self.generation
+
+    def before_call(self):
+        """Reserve a slot for a call and return its ticket, or raise CircuitOpenError"""
+        with self._lock:
+            if self.state == OPEN:
+                elapsed = time.monotonic() - self.opened_at
+                if elapsed < self.reset_timeout:
+                    raise CircuitOpenError(self.reset_timeout - elapsed)
+                self._set_state(HALF_OPEN)
+
+            if self.state == HALF_OPEN:
+                if self.probes_in_flight >= self.half_open_calls:
+                    raise CircuitOpenError(self.reset_timeout)
+                self.probes_in_flight += 1
+                return self.generation, True
+            return self.generation, False
+
+    def record_success(self, ticket):
+        with self._lock:
+            if self.state == CLOSED:
+                self.consecutive_failures = 0
+            elif self.state == HALF_OPEN and self._is_probe(ticket):
+                self.consecutive_failures = 0
+                self._set_state(CLOSED)
+
+    def record_failure(self, ticket):
+        with self._lock:
+            if self.state == CLOSED:
+                self.consecutive_failures += 1
+                if self.consecutive_failures < self.failure_threshold:
+                    return
+            elif not (self.state == HALF_OPEN and self._is_probe(ticket)):
+                # Already open, or a call admitted before the breaker opened
+                return
+            self.times_opened += 1
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def release(self, ticket):
+        """Free the call's probe slot, whatever happened to the call"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._is_probe(ticket):
+                self.probes_in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            retry_after = 0.0
+            if self.state == OPEN:
+                retry_after = max(self.reset_timeout - (time.monotonic() - self.opened_at), 0.0)
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "times_opened": self.times_opened,
+                "retry_after_seconds": round(retry_after, 3),
+            }
+
+
+class FraudClient:
+    """Thread-safe client for the fraud verification API"""
+
+    def __init__(self, url, timeout, connect_timeout=None, pool_size=20, breaker=None, observer=None):
+        self.url = url
+        # observer(outcome, seconds) is told about every call; seconds is None for rejected calls
+        self.observer = observer
+        self.timeout = (connect_timeout or timeout, timeout)
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.session = self._new_session()
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.timeouts = 0
+        self.connection_errors = 0
+        self.non_200 = 0
+        self.errors = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def _new_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def reset_session(self):
+        """Replace the connection pool, e.g. in a freshly forked worker"""
+        self.session = self._new_session()
+
+    def post(self, payload):
+        """
+        POST payload to the fraud API and return the response.
+
+        Raises CircuitOpenError without making a request while the breaker is
+        open; requests.exceptions.Timeout / ConnectionError propagate as before.
+        """
+        try:
+            ticket = self.breaker.before_call()
+        except CircuitOpenError:
+            with self._lock:
+                self.rejected += 1
+            if self.observer:
+                self.observer('circuit_open', None)
+            raise
+
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.exceptions.Timeout:
+            self._record(time.perf_counter() - start, 'timeout')
+            self.breaker.record_failure(ticket)
+            raise
+        except requests.exceptions.ConnectionError:
+            self._record(time.perf_counter() - start, 'connection_error')
+            self.breaker.record_failure(ticket)
+            raise
+        except requests.exceptions.RequestException:
+            self._record(time.perf_counter() - start, 'error')
+            self.breaker.record_failure(ticket)
+            raise
+        else:
+            self._record(time.perf_counter() - start, 'ok' if response.status_code == 200 else 'non_200')
+            self.breaker.record_success(ticket)
+            return response
+        finally:
+            # After the outcome is recorded, so a half-open breaker cannot admit a second probe in between.
+            # Also on errors outside requests' hierarchy, which would otherwise keep a probe slot forever.
+            self.breaker.release(ticket)
+
+    def _record(self, latency, outcome):
+        if self.observer:
+            self.observer(outcome, latency)
+        with self._lock:
+            self.calls += 1
+            self.latency_total += latency
+            self.latency_last = latency
+            self.latency_max = max(self.latency_max, latency)
+            if outcome == 'timeout':
+                self.timeouts += 1
+            elif outcome == 'connection_error':
+                self.connection_errors += 1
+            elif outcome == 'non_200':
+                self.non_200 += 1
+            elif outcome == 'error':
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = {
+                "url": self.url,
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "connection_errors": self.connection_errors,
+                "non_200": self.non_200,
+                "other_errors": self.errors,
+                "rejected_by_breaker": self.rejected,
+                "latency_avg_ms": round(self.latency_total / self.calls * 1000, 3) if self.calls else 0.0,
+                "latency_last_ms": round(self.latency_last * 1000, 3),
+                "latency_max_ms": round(self.latency_max * 1000, 3),
+            }
+        stats["breaker"] = self.breaker.snapshot()
+        return stats
@@ -0,0 +1,89 @@
+"""
+Gunicorn configuration for the payment processor.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Every setting can be overridden through the environment. Each worker process
+gets its own database engine, fraud API session and background threads via
+app.init_worker(), called after the worker has loaded the app.
+"""
+
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+# app.py skips starting its background threads at import; post_worker_init does it per worker
+os.environ['APP_DEFER_WORKER_INIT'] = '1'
+
+# Workers share their metrics here so /metrics covers all of them, whichever worker answers the scrape
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'payment-processor-metrics'))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+
+# 'gthread' (threads per worker) or 'gevent' (async workers, best for fraud-bound traffic)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '500'))  # gevent only
+
+# Every worker opens its own pool, so the primary sees workers x per-worker connections. Keep
+# that within DB_CONNECTION_BUDGET: Postgres max_connections (100 by default) less headroom for
+# superuser slots, migrations and psql sessions.
+db_connection_budget = int(os.getenv('DB_CONNECTION_BUDGET', '90'))
+if os.getenv('DB_POOL_MODE', 'queue').lower() == 'null':
+    # A connection per in-flight request
+    db_connections_per_worker = worker_connections if worker_class == 'gevent' else threads
+else:
+    db_connections_per_worker = int(os.getenv('DB_POOL_SIZE', '10')) + int(os.getenv('DB_MAX_OVERFLOW', '10'))
+max_workers_for_budget = max(1, db_connection_budget // max(1, db_connections_per_worker))
+workers = int(os.getenv('GUNICORN_WORKERS') or min(multiprocessing.cpu_count() * 2 + 1, max_workers_for_budget))
+
+# Connections waiting for a worker; beyond this the kernel refuses them instead of queueing forever
+backlog = int(os.getenv('GUNICORN_BACKLOG', '512'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# On SIGTERM workers stop accepting and get this long to finish in-flight payments
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+
+# Recycle workers periodically; jitter stops them all restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() in ('1', 'true', 'yes')
+
+accesslog = os.getenv('GUNICORN_ACCESSLOG') or None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+
+def on_starting(server):
+    total = workers * db_connections_per_worker
+    if total > db_connection_budget:
+        server.log.warning(
+            "%d workers x %d database connections = %d, over DB_CONNECTION_BUDGET=%d; "
+            "lower GUNICORN_WORKERS or DB_POOL_SIZE / DB_MAX_OVERFLOW",
+            workers, db_connections_per_worker, total, db_connection_budget)
+    # Totals from a previous run would otherwise be added to this one's
+    metrics_dir = os.environ['METRICS_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # Let psycopg2 yield to other greenlets while waiting on Postgres
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+
+def post_worker_init(worker):
+    import app
+    app.init_worker()
+    worker.log.info("Worker %s initialised", worker.pid)
+
+
+def worker_exit(server, worker):
+    # In-flight requests have finished (or graceful_timeout expired); flush queued writes
+    import app
+    app.shutdown()
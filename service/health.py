@@ -0,0 +1,114 @@
+"""
+Background health prober behind /health.
+
+Dependency checks run on a timer in one thread per process, never on the
+request path: /health and /health/ready only read the last result, so probes
+cost no connections and stay fast even while a dependency is struggling.
+"""
+
+import time
+import socket
+import logging
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+from background import BackgroundLoop
+
+logger = logging.getLogger(__name__)
+
+
+def reason_code(error):
+    """
+    Short code for a failed check, safe to return from /health. The exception
+    text can name hosts, ports and users, so it only goes to the log.
+    """
+    if isinstance(error, (socket.timeout, TimeoutError)):
+        return "timeout"
+    if isinstance(error, ConnectionRefusedError):
+        return "connection_refused"
+    if isinstance(error, socket.gaierror):
+        return "name_resolution"
+    if isinstance(error, OSError):
+        return "network_error"
+    return type(error).__name__
+
+
+def tcp_probe(url, timeout):
+    """Resolve the URL's host and open (then close) a TCP connection to it"""
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    with socket.create_connection((parts.hostname, port), timeout=timeout):
+        pass
+
+
+class HealthProber:
+    """
+    Runs every check in `checks` ({name: callable}) each `interval` seconds.
+    A check passes if its callable returns without raising. Only checks named
+    in `critical` decide readiness; the rest are reported for information.
+    """
+
+    def __init__(self, checks, interval=5.0, stale_after=None, critical=()):
+        self.checks = checks
+        self.interval = interval
+        self.stale_after = stale_after or interval * 3
+        self.critical = set(critical)
+        self._lock = threading.Lock()
+        self._loop = BackgroundLoop("health-prober", self.refresh, interval,
+                                    lambda e: logger.error("Health prober failed: %s", e))
+
+        self.results = None
+        self.checked_at = None
+        self._checked_monotonic = None
+
+    def refresh(self):
+        """Run all checks now and store the results"""
+        previous = self.results or {}
+        results = {}
+        for name, check in self.checks.items():
+            start = time.perf_counter()
+            try:
+                check()
+                result = {"ok": True}
+            except Exception as e:
+                result = {"ok": False, "reason": reason_code(e)}
+                error = e
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            results[name] = result
+
+            # Log transitions only (including a change of reason), not every failed round
+            before = previous.get(name, {"ok": True})
+            if not result["ok"] and (before["ok"] or before["reason"] != result["reason"]):
+                logger.warning("Health check '%s' failed (%s): %s", name, result["reason"], error)
+            elif not before["ok"] and result["ok"]:
+                logger.info("Health check '%s' recovered", name)
+
+        with self._lock:
+            self.results = results
+            self.checked_at = datetime.utcnow()
+            self._checked_monotonic = time.monotonic()
+
+    def snapshot(self):
+        """Last results with their age, or None if no check has completed yet"""
+        with self._lock:
+            if self.results is None:
+                return None
+            age = time.monotonic() - self._checked_monotonic
+            return {
+                "checks": dict(self.results),
+                "checked_at": self.checked_at.isoformat(),
+                "age_seconds": round(age, 3),
+                "stale": age > self.stale_after,
+            }
+
+    def ready(self, snapshot):
+        """True if snapshot is fresh and every critical check passed"""
+        if snapshot is None or snapshot["stale"]:
+            return False
+        return all(snapshot["checks"][name]["ok"] for name in self.critical if name in snapshot["checks"])
+
+    def start(self):
+        self._loop.start()
+
+    def stop(self):
+        self._loop.stop()
@@ -0,0 +1,171 @@
+"""
+Logging setup: optional background writer, JSON output and sampling.
+
+With LOG_ASYNC on, request threads only filter a record and put it on a bounded
+queue; a QueueListener thread formats and writes it. Message interpolation
+(`logger.info("... %s", arg)`) is deferred to that thread too, and records are
+dropped rather than blocking when the queue is full, so handler latency never
+depends on how fast stdout drains.
+
+Sampling applies to INFO and DEBUG only. WARNING and above, and any record
+logged with extra={"keep": True} (slow or failed requests), are always kept.
+"""
+
+import sys
+import json
+import queue
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+from flask import has_request_context, request
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'route', 'keep'}
+
+
+def parse_rates(spec):
+    """'INFO=0.1,/health=0' -> {'INFO': 0.1, '/health': 0.0}"""
+    rates = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        key, _, value = part.rpartition('=')
+        rates[key.strip()] = float(value)
+    return rates
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the Flask route they were logged under, if any"""
+
+    def filter(self, record):
+        if has_request_context():
+            rule = request.url_rule
+            record.route = rule.rule if rule else request.path
+        else:
+            record.route = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps INFO/DEBUG records with a probability taken from `route_rates`
+    (by route) or `level_rates` (by level name), defaulting to 1.0.
+    """
+
+    def __init__(self, level_rates=None, route_rates=None):
+        super().__init__()
+        self.level_rates = level_rates or {}
+        self.route_rates = route_rates or {}
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, 'keep', False):
+            return True
+        rate = self.route_rates.get(getattr(record, 'route', None))
+        if rate is None:
+            rate = self.level_rates.get(record.levelname, 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, 'route', None):
+            entry["route"] = record.route
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener and drops when full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Same process, so nothing needs pickling: skip the eager format() the base class does
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """Handles to the installed filters/handlers, for stats and shutdown"""
+
+    def __init__(self, sampler, queue_handler=None, listener=None):
+        self.sampler = sampler
+        self.queue_handler = queue_handler
+        self.listener = listener
+
+    def restart(self):
+        """Start a fresh queue and writer thread, e.g. in a forked worker"""
+        if self.queue_handler is None:
+            return
+        handlers = self.listener.handlers if self.listener else ()
+        self.queue_handler.queue = queue.Queue(maxsize=self.queue_handler.queue.maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def snapshot(self):
+        stats = {"sampled_out": self.sampler.sampled_out, "async": self.queue_handler is not None}
+        if self.queue_handler is not None:
+            stats["queue_depth"] = self.queue_handler.queue.qsize()
+            stats["dropped"] = self.queue_handler.dropped
+        return stats
+
+
+def configure_logging(level='INFO', fmt='text', async_=True, level_rates=None,
+                      route_rates=None, queue_size=10000):
+    """Replace the root logger's handlers with the configured pipeline"""
+    if fmt == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(levelname)s:%(name)s:%(message)s')
+
+    sink = logging.StreamHandler(sys.stdout if fmt == 'json' else sys.stderr)
+    sink.setFormatter(formatter)
+
+    sampler = SamplingFilter(level_rates, route_rates)
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    if not async_:
+        sink.addFilter(RequestContextFilter())
+        sink.addFilter(sampler)
+        root.addHandler(sink)
+        return LogPipeline(sampler)
+
+    # Filters run on the request thread, before the record is queued
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(sampler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, sink, respect_handler_level=True)
+    listener.start()
+    return LogPipeline(sampler, queue_handler, listener)
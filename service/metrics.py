@@ -0,0 +1,323 @@
+"""
+Minimal Prometheus-style metrics registry.
+
+Recording is lock-free: every OS thread writes to its own shard (a plain dict
+only it mutates), and shards are only summed when /metrics is scraped. A
+shard is created, under a lock, the first time a thread records anything.
+
+Shards are keyed by the OS thread id, not a threading.local. Under gevent's
+monkey-patching a local is per greenlet, and one shard per request would
+pile up without bound. Greenlets of one thread share its shard, which is
+still safe, since they never switch in the middle of an update. A new thread
+that reuses a finished thread's id takes over that thread's shard.
+
+Under a pre-forking server each worker has its own registry. SharedMetrics
+makes /metrics cover all of them: every worker writes a snapshot to a shared
+directory, and whichever worker answers a scrape adds the others' snapshots
+to its own live values.
+"""
+
+import os
+import json
+import time
+import bisect
+import _thread
+import logging
+import threading
+from background import BackgroundLoop
+
+try:
+    from gevent import monkey as _gevent_monkey
+except ImportError:
+    _gevent_monkey = None
+
+logger = logging.getLogger(__name__)
+
+
+def _os_thread_ident_fn():
+    """get_ident of the real OS thread, even when threading is monkey-patched"""
+    if _gevent_monkey is not None:
+        return _gevent_monkey.get_original('_thread', 'get_ident')
+    return _thread.get_ident
+
+# Seconds; dense around the 500ms p95 SLA so p50/p95/p99 can be read off the buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [(n, v) for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+
+    def __init__(self, registry, name, help, labelnames):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labels, amount=1):
+        shard = self.registry._shard()
+        key = (self.name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def render(self, merged):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(merged.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, registry, name, help, labelnames, buckets=DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self.registry._shard()
+        key = (self.name, labels)
+        state = shard.get(key)
+        if state is None:
+            # per-bucket counts, then +Inf, then sum
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def render(self, merged):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, state in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = ("le", _format_value(float(bound)))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{label_str} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Sampled at scrape time from `fn`, which returns [(label_values, value), ...]"""
+
+    def __init__(self, name, help, labelnames, fn):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self, samples, worker_label=False):
+        """samples is [(worker, label_values, value), ...]; worker_label adds a `worker` label"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        for worker, labels, value in samples:
+            extra = ("worker", worker) if worker_label else None
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._ident = _os_thread_ident_fn()
+        # OS thread id -> shard
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._metrics = []
+        self._gauges = []
+
+    def _shard(self):
+        ident = self._ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(self, name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(self, name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, labelnames, fn):
+        metric = Gauge(name, help, labelnames, fn)
+        self._gauges.append(metric)
+        return metric
+
+    def _merge(self, others=()):
+        """Sum all shards, plus other processes' snapshots, into {metric_name: {labels: value}}"""
+        with self._lock:
+            shards = list(self._shards.values())
+        merged = {}
+        for shard in shards:
+            # dict.copy() is atomic under the GIL; the owning thread may keep writing meanwhile
+            for (name, labels), value in shard.copy().items():
+                _add(merged.setdefault(name, {}), labels, value)
+        for snapshot in others:
+            for name, series in snapshot["metrics"].items():
+                per_metric = merged.setdefault(name, {})
+                for labels, value in series:
+                    _add(per_metric, tuple(labels), value)
+        return merged
+
+    def _sample_gauges(self):
+        """{gauge name: [(label_values, value), ...]}, skipping collectors that fail"""
+        samples = {}
+        for gauge in self._gauges:
+            try:
+                samples[gauge.name] = [(tuple(labels), value) for labels, value in gauge.fn()]
+            except Exception:
+                # A failing collector must not break the whole scrape
+                continue
+        return samples
+
+    def snapshot(self):
+        """This process's counters, histograms and gauges as JSON-serialisable data"""
+        return {
+            "metrics": {name: [[list(labels), value] for labels, value in series.items()]
+                        for name, series in self._merge().items()},
+            "gauges": {name: [[list(labels), value] for labels, value in series]
+                       for name, series in self._sample_gauges().items()},
+        }
+
+    def render(self, others=(), worker=None):
+        """
+        All metrics in the Prometheus text exposition format.
+
+        `others` are snapshots from other processes (see SharedMetrics):
+        their counters and histograms are summed into this process's, and
+        every gauge sample gets a `worker` label, this process's being `worker`.
+        """
+        merged = self._merge(others)
+        gauges = {name: [(worker, labels, value) for labels, value in series]
+                  for name, series in self._sample_gauges().items()}
+        for snapshot in others:
+            if snapshot.get("live"):
+                for name, series in snapshot["gauges"].items():
+                    gauges.setdefault(name, []).extend(
+                        (snapshot["worker"], tuple(labels), value) for labels, value in series)
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged.get(metric.name, {})))
+        for gauge in self._gauges:
+            lines.extend(gauge.render(gauges.get(gauge.name, []), worker_label=worker is not None))
+        return "\n".join(lines) + "\n"
+
+
+def _add(per_metric, labels, value):
+    if isinstance(value, list):
+        current = per_metric.get(labels)
+        if current is None:
+            per_metric[labels] = list(value)
+        else:
+            for i, v in enumerate(value):
+                current[i] += v
+    else:
+        per_metric[labels] = per_metric.get(labels, 0) + value
+
+
+class SharedMetrics:
+    """
+    Cross-worker /metrics through a directory all workers of one server share.
+
+    Every `interval` seconds, and once more on stop(), the worker writes its
+    registry snapshot to <directory>/<pid>-<start time>.json (write, then
+    rename, so readers never see half a file; the start time keeps a reused
+    pid from overwriting an exited worker's totals). render() adds every
+    other file to this worker's live values:
+    - Counters and histograms are summed, including those of workers that
+      have exited, so totals never go backwards when a worker is recycled.
+    - Gauges are per worker, labelled `worker="<pid>"`, and only taken from
+      files written in the last `stale_after` seconds.
+
+    Other workers' numbers are up to `interval` seconds old. The directory has
+    to be emptied when the server starts (see gunicorn.conf.py on_starting),
+    or a restart would add the previous run's totals.
+    """
+
+    def __init__(self, registry, directory, interval=1.0, stale_after=None):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.stale_after = stale_after or interval * 3
+        self.pid = os.getpid()
+        self.filename = None
+        self._loop = BackgroundLoop("metrics-writer", self.write, interval, self._write_failed)
+        self.write_errors = 0
+
+    def write(self):
+        snapshot = self.registry.snapshot()
+        snapshot["worker"] = str(self.pid)
+        path = os.path.join(self.directory, self.filename)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def others(self):
+        """Snapshots of every other worker's last write, each with `live` set if it is recent"""
+        snapshots = []
+        now = time.time()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return snapshots
+        for name in names:
+            if not name.endswith(".json") or name == self.filename:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+                snapshot["live"] = now - os.path.getmtime(path) <= self.stale_after
+            except (OSError, ValueError):
+                # Removed or replaced while we read it; it is back on the next scrape
+                continue
+            snapshots.append(snapshot)
+        return snapshots
+
+    def render(self):
+        return self.registry.render(self.others(), worker=str(self.pid))
+
+    def start(self):
+        # Workers are forked after this object is built; take the pid of the process that runs it
+        self.pid = os.getpid()
+        self.filename = f"{self.pid}-{time.time_ns()}.json"
+        os.makedirs(self.directory, exist_ok=True)
+        self._loop.start()
+
+    def stop(self):
+        # Not started, or already stopped and written
+        if self.filename is None or self._loop.stopping:
+            return
+        self._loop.stop()
+        try:
+            self.write()
+        except OSError as e:
+            logger.warning("Final metrics snapshot not written: %s", e)
+
+    def _write_failed(self, e):
+        self.write_errors += 1
+        logger.warning("Metrics snapshot not written: %s", e)
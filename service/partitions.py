@@ -0,0 +1,97 @@
+"""
+Upkeep for the monthly partitions of the transactions table.
+
+Postgres has no built-in scheduler, so the service does it: every `interval`
+seconds one process (an advisory lock keeps the others out) makes sure the
+partitions for the current month and `premake` months ahead exist, and with
+a `retention_months` > 0 detaches partitions that ended more than that many
+months ago. The work itself is done by the SQL functions in db/init.sql,
+create_transaction_partitions and detach_transaction_partitions.
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+from sqlalchemy import text
+from background import BackgroundLoop, PARTITION_MAINTENANCE_LOCK_KEY
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionMaintainer:
+
+    def __init__(self, connect, interval=3600.0, premake=3, retention_months=0):
+        self.connect = connect
+        self.interval = interval
+        self.premake = premake
+        self.retention_months = retention_months
+        self._lock = threading.Lock()
+        self._loop = BackgroundLoop("partition-maintainer", self.maintain, interval,
+                                    lambda e: logger.warning("Partition maintenance failed: %s", e))
+
+        self.runs = 0
+        self.skipped = 0
+        self.created = 0
+        self.detached = 0
+        self.partitions = []
+        self.last_duration = 0.0
+        self.last_run_at = None
+
+    def maintain(self):
+        """Create and detach partitions as needed; False if another process holds the lock"""
+        start = time.monotonic()
+        with self.connect() as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": PARTITION_MAINTENANCE_LOCK_KEY}).scalar():
+                conn.rollback()
+                with self._lock:
+                    self.skipped += 1
+                return False
+
+            created = conn.execute(text("""
+                SELECT create_transaction_partitions(date_trunc('month', LOCALTIMESTAMP),
+                                                     date_trunc('month', LOCALTIMESTAMP) + make_interval(months => :months))
+            """), {"months": self.premake + 1}).scalar()
+            detached = 0
+            if self.retention_months > 0:
+                detached = conn.execute(text("""
+                    SELECT detach_transaction_partitions(date_trunc('month', LOCALTIMESTAMP) - make_interval(months => :months))
+                """), {"months": self.retention_months}).scalar()
+            partitions = conn.execute(text("""
+                SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'transactions'::regclass ORDER BY c.relname
+            """)).scalars().all()
+            conn.commit()
+
+        if created or detached:
+            logger.info("Transaction partitions: created %s, detached %s", created, detached)
+        with self._lock:
+            self.runs += 1
+            self.created += created
+            self.detached += detached
+            self.partitions = partitions
+            self.last_duration = time.monotonic() - start
+            self.last_run_at = datetime.utcnow()
+        return True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "interval_seconds": self.interval,
+                "premake_months": self.premake,
+                "retention_months": self.retention_months,
+                "runs": self.runs,
+                "skipped_locked": self.skipped,
+                "partitions_created": self.created,
+                "partitions_detached": self.detached,
+                "partitions": list(self.partitions),
+                "last_duration_ms": round(self.last_duration * 1000, 3),
+                "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+                "running": self._loop.running,
+            }
+
+    def start(self):
+        self._loop.start()
+
+    def stop(self):
+        self._loop.stop()
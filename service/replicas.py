@@ -0,0 +1,217 @@
+"""
+Read replicas and the routing of read-only queries to them.
+
+A ReplicaSet holds one engine per streaming replica and a background thread
+that measures each replica's replay lag every `check_interval` seconds, as how
+long ago the primary's WAL position was first seen past what the replica has
+replayed. A replica whose WAL receiver is disconnected stops replaying, so it
+reads as lagging as soon as the primary writes anything it has not seen.
+connect() hands out a replica connection when one is within the caller's lag
+tolerance and falls back to the primary otherwise: no replica measured
+recently enough (`stale_after`), all of them lagging, a replica refusing the
+connection, or a sticky read.
+
+Reads can be sticky: after a write, the handler marks the customer ids
+involved with mark_written(), and for `sticky_seconds` afterwards reads for
+those ids go to the primary. The marks live in this process only. The service
+covers the writing client on every worker separately, with a cookie on the
+write response that connect() callers turn into a "sticky" pin.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from sqlalchemy import text
+from background import BackgroundLoop
+
+import db
+
+logger = logging.getLogger(__name__)
+
+# WAL positions as byte offsets, comparable between the primary and its replicas
+PRIMARY_LSN_QUERY = "SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"
+# Replayed position is NULL before the replica has replayed anything; a server not in recovery is a
+# primary listed as a replica (e.g. in development) and is never behind
+REPLAY_LSN_QUERY = "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn() - '0/0'::pg_lsn"
+
+# Primary WAL positions older than this are dropped, keeping the newest; a replica behind all of
+# them reads as lagging since the oldest one kept
+LSN_HISTORY_SECONDS = 600
+
+# Above this many read-your-writes marks, expired ones are swept on the next write
+STICKY_SWEEP_AT = 10000
+
+
+class Replica:
+
+    def __init__(self, name, engine, pool_stats=None):
+        self.name = name
+        self.engine = engine
+        self.pool_stats = pool_stats or db.PoolStats()
+        self.lag = None
+        self.checked_at = None
+        self.error = None
+        self.check_failures = 0
+        self.reads = 0
+
+
+class ReplicaSet:
+
+    def __init__(self, replicas, primary, check_interval=1.0, stale_after=3.0, sticky_seconds=5.0, observer=None):
+        self.replicas = list(replicas)
+        self.primary = primary
+        self.check_interval = check_interval
+        self.stale_after = stale_after
+        self.sticky_seconds = sticky_seconds
+        self.observer = observer
+        self._lock = threading.Lock()
+        self._loop = BackgroundLoop("replica-lag-checker", self.check, check_interval,
+                                    lambda e: logger.warning("Replica lag check failed: %s", e))
+        self._next = 0
+        # (monotonic time, primary WAL position) when the primary was first seen at each position, oldest first
+        self._primary_lsns = deque()
+        # key -> monotonic time its reads may go back to replicas
+        self._written = {}
+
+        self.routed = {}
+
+    def check(self):
+        """Measure every replica's replay lag; unreachable replicas get lag None"""
+        # The primary first: a replica that has replayed this position was not behind when checked
+        with self.primary() as conn:
+            self._sample_primary(conn.execute(text(PRIMARY_LSN_QUERY)).scalar())
+        for replica in self.replicas:
+            try:
+                with db.connect(replica.engine, replica.pool_stats) as conn:
+                    in_recovery, replayed = conn.execute(text(REPLAY_LSN_QUERY)).fetchone()
+            except Exception as e:
+                self.mark_failed(replica, e)
+                continue
+            lag = self._lag_behind(replayed) if in_recovery else 0.0
+            with self._lock:
+                replica.lag = lag
+                replica.checked_at = time.monotonic()
+                replica.error = None
+
+    def _sample_primary(self, lsn):
+        now = time.monotonic()
+        samples = self._primary_lsns
+        if not samples or lsn > samples[-1][1]:
+            samples.append((now, lsn))
+        while len(samples) > 1 and now - samples[1][0] > LSN_HISTORY_SECONDS:
+            samples.popleft()
+
+    def _lag_behind(self, replayed):
+        """Seconds since the primary was first seen past `replayed`, 0 if it has not been"""
+        now = time.monotonic()
+        for sampled_at, lsn in self._primary_lsns:
+            if replayed is None or lsn > replayed:
+                return now - sampled_at
+        return 0.0
+
+    def mark_failed(self, replica, error):
+        """Take a replica out of rotation until its next successful check"""
+        if replica.error is None:
+            logger.warning("Read replica %s unavailable: %s", replica.name, error)
+        with self._lock:
+            replica.lag = None
+            replica.error = str(error)
+            replica.check_failures += 1
+
+    def choose(self, max_lag):
+        """(replica, None), or (None, reason) when the read has to go to the primary"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                r for r in self.replicas
+                if r.lag is not None and now - r.checked_at <= self.stale_after and r.lag <= max_lag
+            ]
+            if not candidates:
+                measured = any(r.lag is not None and now - r.checked_at <= self.stale_after for r in self.replicas)
+                return None, "lagging" if measured else "unavailable"
+            self._next += 1
+            replica = candidates[self._next % len(candidates)]
+            replica.reads += 1
+            return replica, None
+
+    def mark_written(self, *keys):
+        """Send reads for keys to the primary for the next sticky_seconds"""
+        until = time.monotonic() + self.sticky_seconds
+        with self._lock:
+            if len(self._written) >= STICKY_SWEEP_AT:
+                now = time.monotonic()
+                self._written = {k: t for k, t in self._written.items() if t > now}
+            for key in keys:
+                if key is not None:
+                    self._written[key] = until
+
+    def is_sticky(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            return any(self._written.get(key, 0) > now for key in keys if key is not None)
+
+    @contextmanager
+    def connect(self, fallback, max_lag, pin=None):
+        """
+        Connection from a replica at most max_lag seconds behind, or from
+        fallback() (the primary) when no replica qualifies. A `pin` reason
+        ("sticky", "consistency") skips the replicas and is counted as such.
+        """
+        replica, reason = (None, pin) if pin else self.choose(max_lag)
+        with ExitStack() as stack:
+            conn = None
+            if replica is not None:
+                try:
+                    conn = stack.enter_context(db.connect(replica.engine, replica.pool_stats))
+                except Exception as e:
+                    self.mark_failed(replica, e)
+                    reason = "unavailable"
+            if conn is None:
+                conn = stack.enter_context(fallback())
+            self._record(reason or "replica")
+            yield conn
+
+    def _record(self, reason):
+        with self._lock:
+            self.routed[reason] = self.routed.get(reason, 0) + 1
+        if self.observer is not None:
+            self.observer("replica" if reason == "replica" else "primary", reason)
+
+    def lags(self):
+        """[(name, lag seconds)] for replicas with a current measurement"""
+        now = time.monotonic()
+        with self._lock:
+            return [(r.name, r.lag) for r in self.replicas
+                    if r.lag is not None and now - r.checked_at <= self.stale_after]
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            replicas = [{
+                "name": r.name,
+                "lag_ms": round(r.lag * 1000, 3) if r.lag is not None else None,
+                "checked_seconds_ago": round(now - r.checked_at, 3) if r.checked_at is not None else None,
+                "error": r.error,
+                "check_failures": r.check_failures,
+                "reads": r.reads,
+            } for r in self.replicas]
+            stats = {
+                "check_interval_seconds": self.check_interval,
+                "stale_after_seconds": self.stale_after,
+                "sticky_seconds": self.sticky_seconds,
+                "sticky_keys": sum(1 for t in self._written.values() if t > now),
+                "routed": dict(self.routed),
+                "running": self._loop.running,
+            }
+        for replica, entry in zip(self.replicas, replicas):
+            entry["pool"] = replica.pool_stats.snapshot(replica.engine)
+        stats["replicas"] = replicas
+        return stats
+
+    def start(self):
+        self._loop.start()
+
+    def stop(self):
+        self._loop.stop()
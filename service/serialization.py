@@ -0,0 +1,109 @@
+"""
+Row serialization for the read endpoints.
+
+Each query declares its columns once as a RowShape: (json key, column, kind).
+The shape builds the SELECT list, turns rows into dicts, and can also encode a
+row straight to JSON text without building the dict first.
+
+All output is byte-identical to Flask's jsonify of the equivalent dict: keys
+sorted, compact separators, ASCII-only escapes. Flask adds a trailing newline,
+which json_response() adds too. Decimals become floats and datetimes ISO 8601
+strings, the same conversions the handlers used to do by hand.
+"""
+
+import json
+from datetime import date
+from decimal import Decimal
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+import timing
+
+_encode_str = json.encoder.encode_basestring_ascii
+_float_repr = float.__repr__
+_int_repr = int.__repr__
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Same settings as Flask's default provider outside debug mode
+_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"), ensure_ascii=True, default=_default)
+dumps = _encoder.encode
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's default JSON provider, with jsonify's encoding timed as a `serialize` span"""
+
+    def dumps(self, obj, **kwargs):
+        with timing.span("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+def json_response(body, status=200):
+    """Response for already-encoded JSON text, with the headers jsonify would send"""
+    return Response(body + "\n", status=status, mimetype="application/json")
+
+
+# kind -> (expression for to_dict, expression for to_json), over a local named {v}
+KINDS = {
+    "str": ("{v}", "'null' if {v} is None else _encode_str({v})"),
+    "decimal": ("None if {v} is None else float({v})", "'null' if {v} is None else _float_repr(float({v}))"),
+    # isoformat() is always ASCII, so it needs no escaping
+    "datetime": ("{v}.isoformat() if {v} else None", "'null' if {v} is None else '\"' + {v}.isoformat() + '\"'"),
+    "int": ("{v}", "'null' if {v} is None else _int_repr({v})"),
+    "bool": ("{v}", "'null' if {v} is None else ('true' if {v} else 'false')"),
+    "json": ("{v}", "dumps({v})"),
+}
+
+_GLOBALS = {"_encode_str": _encode_str, "_float_repr": _float_repr, "_int_repr": _int_repr, "dumps": dumps}
+
+
+def _compile(name, fields, body):
+    """
+    Build a function of one row that unpacks it into locals v0..vN and
+    returns `body`. Done once per shape, like namedtuple/dataclasses do, so
+    encoding a row is a single expression with no per-field calls or loops.
+    """
+    names = ", ".join(f"v{i}" for i in range(len(fields)))
+    source = f"def {name}(row):\n    {names}, = row\n    return {body}\n"
+    namespace = {}
+    exec(source, dict(_GLOBALS), namespace)
+    return namespace[name]
+
+
+class RowShape:
+    """
+    Column-to-key mapping for one query's rows.
+
+    `fields` is a sequence of (key, column, kind) in SELECT order; kind is one
+    of KINDS. Use `columns` as the SELECT list so positions always line up.
+    """
+
+    def __init__(self, fields):
+        fields = tuple(fields)
+        for key, column, kind in fields:
+            if kind not in KINDS:
+                raise ValueError(f"Unknown kind {kind!r} for column {column}")
+        self.keys = tuple(key for key, _, _ in fields)
+        self.columns = ", ".join(column for _, column, _ in fields)
+
+        items = ", ".join(
+            f"{key!r}: {KINDS[kind][0].format(v=f'v{i}')}" for i, (key, _, kind) in enumerate(fields)
+        )
+        self.to_dict = _compile("to_dict", fields, "{" + items + "}")
+
+        # A %-template in sorted key order, filled with one encoded value per key
+        ordered = sorted(enumerate(fields), key=lambda f: f[1][0])
+        template = "{" + ",".join(_encode_str(key).replace("%", "%%") + ":%s" for _, (key, _, _) in ordered) + "}"
+        values = ", ".join(f"({KINDS[kind][1].format(v=f'v{i}')})" for i, (_, _, kind) in ordered)
+        self.to_json = _compile("to_json", fields, f"{template!r} % ({values},)")
+
+    def to_json_array(self, rows):
+        return "[" + ",".join(map(self.to_json, rows)) + "]"
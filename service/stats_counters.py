@@ -0,0 +1,151 @@
+"""
+In-memory counters behind /api/stats.
+
+Counts are seeded from the database and then kept current by the write paths
+(record_transactions / record_customer), so serving them never touches the
+transactions table. A background thread re-seeds every half `refresh_interval`
+to pick up writes made by other processes; `refresh_interval` is the
+staleness bound for rows this process did not write itself.
+
+The counting queries scan the transactions table, so one process runs them
+for all: whichever gets the advisory lock once the shared counts in
+`stats_snapshot` are older than half the interval. Every other process
+re-seeds from that row.
+"""
+
+import json
+import time
+import logging
+import threading
+from sqlalchemy import text
+from background import BackgroundLoop, STATS_RECOUNT_LOCK_KEY
+
+logger = logging.getLogger(__name__)
+
+WINDOW_MINUTES = 60
+
+SNAPSHOT_QUERY = """
+    SELECT computed_at, EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - computed_at),
+           total_transactions, total_customers, minutes
+    FROM stats_snapshot
+"""
+
+
+class StatsCounters:
+
+    def __init__(self, connect, primary, refresh_interval=30.0):
+        # connect runs the counting queries (a replica will do); primary holds the lock and the shared row
+        self.connect = connect
+        self.primary = primary
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._loop = BackgroundLoop("stats-refresh", self.refresh, refresh_interval / 2,
+                                    lambda e: logger.warning("Stats refresh failed: %s", e))
+
+        self.seeded_at = None
+        self.total_transactions = 0
+        self.total_customers = 0
+        # minute index -> {status: count}, for the trailing hour
+        self.minutes = {}
+        self.recounts = 0
+
+    def refresh(self):
+        """Re-seed all counters from the shared counts, recounting them first if they are due"""
+        with self.primary() as conn:
+            row = conn.execute(text(SNAPSHOT_QUERY)).fetchone()
+            if self._due(row) and conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"),
+                                               {"key": STATS_RECOUNT_LOCK_KEY}).scalar():
+                # Another process may have recounted between the read and the lock
+                row = conn.execute(text(SNAPSHOT_QUERY)).fetchone()
+                if self._due(row):
+                    row = self._recount(conn)
+            conn.commit()
+        if row is not None:
+            self._seed(row)
+
+    def _due(self, row):
+        return row is None or row[1] >= self.refresh_interval / 2
+
+    def _recount(self, conn):
+        """Count everything and store it in stats_snapshot; returns the row as SNAPSHOT_QUERY reads it"""
+        with self.connect() as count_conn:
+            total_transactions = count_conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar()
+            total_customers = count_conn.execute(text("SELECT COUNT(*) FROM customers")).scalar()
+            # Bucket by age so the result does not depend on the DB server's clock or timezone
+            result = count_conn.execute(text("""
+                SELECT FLOOR(EXTRACT(EPOCH FROM (NOW()::timestamp - created_at)) / 60)::int AS minutes_ago,
+                       status, COUNT(*)
+                FROM transactions
+                WHERE created_at > NOW() - INTERVAL '1 hour'
+                GROUP BY minutes_ago, status
+            """))
+            rows = result.fetchall()
+
+        now_minute = int(time.time() // 60)
+        minutes = {}
+        for minutes_ago, status, count in rows:
+            bucket = minutes.setdefault(now_minute - max(minutes_ago, 0), {})
+            bucket[status] = bucket.get(status, 0) + count
+
+        self.recounts += 1
+        return conn.execute(text("""
+            INSERT INTO stats_snapshot (id, total_transactions, total_customers, minutes, computed_at)
+            VALUES (TRUE, :transactions, :customers, :minutes, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (id) DO UPDATE SET total_transactions = EXCLUDED.total_transactions,
+                total_customers = EXCLUDED.total_customers, minutes = EXCLUDED.minutes,
+                computed_at = EXCLUDED.computed_at
+            RETURNING computed_at, 0, total_transactions, total_customers, minutes
+        """), {"transactions": total_transactions, "customers": total_customers,
+               "minutes": json.dumps(minutes)}).fetchone()
+
+    def _seed(self, row):
+        computed_at, _, total_transactions, total_customers, minutes = row
+        with self._lock:
+            # The same row again would drop what this process recorded since seeding from it
+            if computed_at == self.seeded_at:
+                return
+            self.total_transactions = total_transactions
+            self.total_customers = total_customers
+            self.minutes = {int(minute): dict(bucket) for minute, bucket in minutes.items()}
+            self.seeded_at = computed_at
+
+    def record_transactions(self, rows):
+        """Count rows that were just committed to transactions"""
+        now_minute = int(time.time() // 60)
+        with self._lock:
+            bucket = self.minutes.setdefault(now_minute, {})
+            for row in rows:
+                bucket[row["status"]] = bucket.get(row["status"], 0) + 1
+            self.total_transactions += len(rows)
+
+    def record_customer(self):
+        with self._lock:
+            self.total_customers += 1
+
+    def snapshot(self):
+        """Current counts, or None if the counters have never been seeded"""
+        cutoff = int(time.time() // 60) - WINDOW_MINUTES
+        with self._lock:
+            if self.seeded_at is None:
+                return None
+            for minute in [m for m in self.minutes if m <= cutoff]:
+                del self.minutes[minute]
+
+            last_hour = {}
+            for bucket in self.minutes.values():
+                for status, count in bucket.items():
+                    last_hour[status] = last_hour.get(status, 0) + count
+
+            return {
+                "total_transactions": self.total_transactions,
+                "total_customers": self.total_customers,
+                "last_hour": last_hour,
+                "stats_as_of": self.seeded_at.isoformat(),
+                "staleness_bound_seconds": self.refresh_interval,
+            }
+
+    def start(self):
+        self._loop.start()
+
+    def stop(self):
+        self._loop.stop()
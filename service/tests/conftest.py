@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The service modules import each other as top-level modules (import db, import timing)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Importing app must not start its background threads or the async log writer
+os.environ.setdefault('APP_DEFER_WORKER_INIT', '1')
+os.environ.setdefault('LOG_ASYNC', 'false')
+os.environ.setdefault('LOG_LEVEL', 'CRITICAL')
+os.environ.pop('METRICS_DIR', None)
+
+
+class FakeClock:
+    """Stands in for time.monotonic; advance() moves it"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def wait_until():
+    """wait_until(condition) polls condition() and fails the test if it stays false for 2s"""
+    def wait(condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "condition not met in time"
+            time.sleep(0.001)
+    return wait
@@ -0,0 +1,104 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import admission
+from admission import RateLimiter, ConcurrencyLimiter, Overloaded
+
+
+@pytest.fixture
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(admission, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_rate_limit_allows_the_burst_then_refills(fake_time):
+    limiter = RateLimiter(per_minute=60, burst=3)
+
+    assert [limiter.check("client", "/api/payments") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.check("client", "/api/payments") == pytest.approx(1.0)
+
+    fake_time.advance(1.0)
+    assert limiter.check("client", "/api/payments") == 0.0
+    assert limiter.snapshot()["limited"] == 1
+
+
+def test_rate_limit_buckets_are_per_client_and_route(fake_time):
+    limiter = RateLimiter(per_minute=60, burst=1)
+
+    assert limiter.check("a", "/api/payments") == 0.0
+    assert limiter.check("a", "/api/payments") > 0
+    assert limiter.check("b", "/api/payments") == 0.0
+    assert limiter.check("a", "/api/customers/<int:customer_id>") == 0.0
+
+
+def test_route_limits_override_and_zero_disables(fake_time):
+    limiter = RateLimiter(per_minute=60, burst=1, route_limits={"/api/payments/batch": 6, "/health": 0})
+
+    limiter.check("a", "/api/payments/batch")
+    # 6 per minute: the next token is 10 seconds away
+    assert limiter.check("a", "/api/payments/batch") == pytest.approx(10.0)
+    assert all(limiter.check("a", "/health") == 0.0 for _ in range(100))
+
+
+def test_least_recent_buckets_are_dropped(fake_time):
+    limiter = RateLimiter(per_minute=60, burst=1, max_buckets=2)
+
+    limiter.check("a", "/")
+    limiter.check("b", "/")
+    limiter.check("a", "/")
+    limiter.check("c", "/")
+
+    assert limiter.snapshot()["tracked_buckets"] == 2
+    # b was the least recently seen, so it starts over with a full bucket
+    assert limiter.check("b", "/") == 0.0
+    assert limiter.check("c", "/") > 0
+
+
+def test_concurrency_limit_sheds_when_the_queue_wait_would_exceed_the_budget():
+    limiter = ConcurrencyLimiter("payments", max_in_flight=1, latency_budget=0.25, initial_service_time=1.0)
+    limiter.acquire()
+
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.reason == "in-flight limit reached"
+    assert limiter.snapshot()["shed"] == 1
+
+
+def test_concurrency_limit_queues_within_the_budget(wait_until):
+    limiter = ConcurrencyLimiter("payments", max_in_flight=1, latency_budget=2.0, initial_service_time=0.01)
+    limiter.acquire()
+    admitted = threading.Event()
+
+    def second():
+        limiter.acquire()
+        admitted.set()
+
+    t = threading.Thread(target=second)
+    t.start()
+    wait_until(lambda: limiter.waiting == 1)
+    limiter.release(0.01)
+    t.join(2)
+
+    assert admitted.is_set()
+    assert limiter.snapshot()["queued"] == 1
+    assert limiter.in_flight == 1
+
+
+def test_concurrency_limit_times_out_a_queued_request():
+    limiter = ConcurrencyLimiter("payments", max_in_flight=1, latency_budget=0.05, initial_service_time=0.01)
+    limiter.acquire()
+
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.reason == "queue wait exceeded latency budget"
+    assert limiter.snapshot()["timeouts"] == 1
+    assert limiter.waiting == 0
+
+
+def test_concurrency_limit_of_zero_admits_everything():
+    limiter = ConcurrencyLimiter("default", max_in_flight=0, latency_budget=0.0)
+    for _ in range(100):
+        limiter.acquire()
+    assert limiter.in_flight == 0
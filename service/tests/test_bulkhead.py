@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from bulkhead import Bulkhead, BulkheadFull, BulkheadTimeout
+
+
+def test_rejects_once_running_and_queued_calls_fill_it(wait_until):
+    bulkhead = Bulkhead("fraud", max_concurrent=1, max_queue=1, timeout=2.0)
+    release = threading.Event()
+    results = []
+
+    def blocked():
+        release.wait(2)
+        return "ok"
+
+    threads = [threading.Thread(target=lambda: results.append(bulkhead.call(blocked))) for _ in range(2)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: bulkhead.active == 1 and bulkhead.pending == 2)
+
+    with pytest.raises(BulkheadFull):
+        bulkhead.call(lambda: "not run")
+
+    release.set()
+    for t in threads:
+        t.join(2)
+    assert results == ["ok", "ok"]
+    snapshot = bulkhead.snapshot()
+    assert snapshot["rejected"] == 1
+    assert snapshot["completed"] == 2
+    # Room again once the calls finished
+    assert bulkhead.call(lambda: "ok") == "ok"
+    bulkhead.shutdown()
+
+
+def test_caller_stops_waiting_at_the_timeout():
+    bulkhead = Bulkhead("fraud", max_concurrent=1, max_queue=0, timeout=0.05)
+
+    started = time.monotonic()
+    with pytest.raises(BulkheadTimeout):
+        bulkhead.call(time.sleep, 0.5)
+    assert time.monotonic() - started < 0.4
+    assert bulkhead.snapshot()["timeouts"] == 1
+    bulkhead.shutdown()
+
+
+def test_call_exceptions_propagate():
+    bulkhead = Bulkhead("fraud", max_concurrent=1, max_queue=0, timeout=1.0)
+
+    def broken():
+        raise ValueError("bad response")
+
+    with pytest.raises(ValueError):
+        bulkhead.call(broken)
+    assert bulkhead.pending == 0
+    bulkhead.shutdown()
@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from cache import ReadThroughCache, MISSING
+
+
+def test_concurrent_misses_share_one_load(wait_until):
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return {"id": 1}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load(1, loader))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: cache.coalesced == 4)
+    release.set()
+    for t in threads:
+        t.join(2)
+
+    assert len(calls) == 1
+    assert results == [{"id": 1}] * 5
+    assert cache.get(1) == {"id": 1}
+
+
+def test_followers_get_the_leaders_error(wait_until):
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+    release = threading.Event()
+
+    def loader():
+        release.wait(2)
+        raise RuntimeError("database down")
+
+    errors = []
+
+    def load():
+        try:
+            cache.get_or_load(1, loader)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=load) for _ in range(3)]
+    for t in threads:
+        t.start()
+    wait_until(lambda: cache.coalesced == 2)
+    release.set()
+    for t in threads:
+        t.join(2)
+
+    assert errors == ["database down"] * 3
+    assert cache.get(1) is MISSING
+
+
+def test_not_found_is_not_cached():
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+    assert cache.get_or_load(1, lambda: None) is None
+    assert cache.get_or_load(1, lambda: {"id": 1}) == {"id": 1}
+
+
+def test_value_loaded_across_an_invalidate_is_returned_but_not_cached():
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+
+    def loader():
+        # A write to the row lands while the read is in progress
+        cache.invalidate(1)
+        return {"balance": "before write"}
+
+    assert cache.get_or_load(1, loader) == {"balance": "before write"}
+    assert cache.get(1) is MISSING
+    assert cache.get_or_load(1, lambda: {"balance": "after write"}) == {"balance": "after write"}
+    assert cache.get(1) == {"balance": "after write"}
+
+
+def test_invalidating_another_key_does_not_affect_a_load():
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+
+    def loader():
+        cache.invalidate(2)
+        return {"id": 1}
+
+    cache.get_or_load(1, loader)
+    assert cache.get(1) == {"id": 1}
+
+
+def test_get_many_loads_only_the_misses_once():
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+    cache.set(1, {"id": 1})
+    requested = []
+
+    def loader(keys):
+        requested.append(list(keys))
+        return {2: {"id": 2}}
+
+    values = cache.get_many_or_load([1, 2, 3, 2], loader)
+
+    assert requested == [[2, 3]]
+    assert values == {1: {"id": 1}, 2: {"id": 2}, 3: None}
+    assert cache.get(2) == {"id": 2}
+    # Not found, so not cached: the next call asks for it again
+    assert cache.get(3) is MISSING
+
+
+def test_get_many_skips_caching_keys_invalidated_during_the_load():
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+
+    def loader(keys):
+        cache.invalidate(1)
+        return {key: {"id": key} for key in keys}
+
+    assert cache.get_many_or_load([1, 2], loader) == {1: {"id": 1}, 2: {"id": 2}}
+    assert cache.get(1) is MISSING
+    assert cache.get(2) == {"id": 2}
+
+
+def test_get_many_loader_error_leaves_no_load_registered():
+    cache = ReadThroughCache(maxsize=10, ttl=60)
+
+    def loader(keys):
+        raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_many_or_load([1, 2], loader)
+    assert cache._loading == {}
+    assert cache.get_many_or_load([1], lambda keys: {1: "one"}) == {1: "one"}
+    assert cache.get(1) == "one"
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import pytest
+
+import fraud_client
+from fraud_client import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+@pytest.fixture
+def breaker(monkeypatch, clock):
+    monkeypatch.setattr(fraud_client, "time", SimpleNamespace(monotonic=clock))
+    return CircuitBreaker(failure_threshold=3, reset_timeout=30.0, half_open_calls=1)
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        ticket = breaker.before_call()
+        breaker.record_failure(ticket)
+        breaker.release(ticket)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    fail(breaker, 2)
+    ticket = breaker.before_call()
+    breaker.record_success(ticket)
+    fail(breaker, 2)
+    assert breaker.state == CLOSED
+
+    fail(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_probe_decides(breaker, clock):
+    fail(breaker, 3)
+    clock.advance(30)
+
+    probe = breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success(probe)
+    breaker.release(probe)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens(breaker, clock):
+    fail(breaker, 3)
+    clock.advance(30)
+    fail(breaker)
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+
+
+def test_release_frees_the_probe_slot(breaker, clock):
+    fail(breaker, 3)
+    clock.advance(30)
+    probe = breaker.before_call()
+    breaker.release(probe)
+    # The probe ended without a verdict (e.g. a 4xx); another may go
+    breaker.record_success(breaker.before_call())
+    assert breaker.state == CLOSED
+
+
+def test_call_admitted_before_opening_cannot_close_or_reopen(breaker, clock):
+    slow = breaker.before_call()
+    fail(breaker, 3)
+    clock.advance(30)
+    probe = breaker.before_call()
+
+    breaker.record_success(slow)
+    breaker.release(slow)
+    assert breaker.state == HALF_OPEN
+    breaker.record_failure(slow)
+    assert breaker.state == HALF_OPEN
+    # The slow call's release must not have freed the probe's slot
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success(probe)
+    assert breaker.state == CLOSED
+
+
+def test_probe_from_an_earlier_half_open_is_ignored(breaker, clock):
+    fail(breaker, 3)
+    clock.advance(30)
+    first_probe = breaker.before_call()
+    breaker.record_failure(first_probe)
+    clock.advance(30)
+    second_probe = breaker.before_call()
+
+    breaker.record_success(first_probe)
+    assert breaker.state == HALF_OPEN
+    breaker.record_success(second_probe)
+    assert breaker.state == CLOSED
@@ -0,0 +1,85 @@
+import base64
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from serialization import RowShape, json_response
+
+SHAPE = RowShape([
+    ("transaction_id", "t.transaction_id", "str"),
+    ("amount", "t.amount", "decimal"),
+    ("created_at", "t.created_at", "datetime"),
+    ("customer_id", "t.customer_id", "int"),
+    ("is_active", "c.is_active", "bool"),
+    ("metadata", "t.metadata", "json"),
+    ("100%_key", "t.odd", "str"),
+])
+
+ROWS = [
+    ("txn-1", Decimal("12.50"), datetime(2024, 11, 15, 9, 30, 0, 123456), 42, True, {"b": 1, "a": [1, 2]}, "x"),
+    ("txé \"quoted\"\n", Decimal("0.1"), datetime(2024, 1, 1), 7, False, None, "%s"),
+    (None, None, None, None, None, None, None),
+]
+
+
+def test_columns_are_the_select_list_in_order():
+    assert SHAPE.columns == ("t.transaction_id, t.amount, t.created_at, t.customer_id, c.is_active, "
+                             "t.metadata, t.odd")
+
+
+@pytest.mark.parametrize("row", ROWS)
+def test_to_json_matches_jsonify_of_to_dict(row):
+    app = Flask(__name__)
+    with app.app_context():
+        expected = jsonify(SHAPE.to_dict(row)).get_data(as_text=True)
+    assert json_response(SHAPE.to_json(row)).get_data(as_text=True) == expected
+
+
+def test_to_dict_converts_decimals_and_datetimes():
+    item = SHAPE.to_dict(ROWS[0])
+    assert item["amount"] == 12.5
+    assert item["created_at"] == "2024-11-15T09:30:00.123456"
+    assert item["metadata"] == {"b": 1, "a": [1, 2]}
+
+
+def test_to_json_array():
+    app = Flask(__name__)
+    with app.app_context():
+        expected = jsonify([SHAPE.to_dict(row) for row in ROWS]).get_data(as_text=True)
+    assert SHAPE.to_json_array(ROWS) + "\n" == expected
+    assert SHAPE.to_json_array([]) == "[]"
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        RowShape([("amount", "amount", "money")])
+
+
+@pytest.fixture(scope="module")
+def service():
+    import app
+    return app
+
+
+@pytest.mark.parametrize("created_at, transaction_id", [
+    (datetime(2024, 11, 15, 9, 30, 0, 123456), "txn-1"),
+    (datetime(2024, 1, 1), "a/b+c=d é"),
+])
+def test_cursor_round_trips(service, created_at, transaction_id):
+    cursor = service.encode_cursor(created_at, transaction_id)
+    assert "=" not in cursor
+    assert service.decode_cursor(cursor) == (created_at, transaction_id)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    base64.urlsafe_b64encode(b'{"created_at": "2024-01-01"}').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "txn-1"]').decode(),
+    base64.urlsafe_b64encode(b'["2024-01-01"]').decode(),
+])
+def test_malformed_cursor_raises_value_error(service, cursor):
+    with pytest.raises(ValueError):
+        service.decode_cursor(cursor)
@@ -0,0 +1,110 @@
+import threading
+
+import pytest
+
+from write_behind import BatchWriter, QueueFullError
+
+
+class Transient(Exception):
+    pass
+
+
+def writer(flush_fn, **kwargs):
+    kwargs.setdefault("retry_delay", 0.001)
+    kwargs.setdefault("max_retry_delay", 0.01)
+    return BatchWriter("test", flush_fn, transient=lambda e: isinstance(e, Transient), **kwargs)
+
+
+def test_rows_queued_together_go_out_in_one_batch():
+    batches = []
+    w = writer(batches.append)
+    pending = [w.submit(i) for i in range(5)]
+    w.start()
+
+    assert all(p.wait(2) for p in pending)
+    assert batches == [[0, 1, 2, 3, 4]]
+    w.close()
+    assert w.snapshot()["rows_written"] == 5
+
+
+def test_transient_failure_is_retried_until_it_succeeds(wait_until):
+    database_up = threading.Event()
+    batches = []
+
+    def flush(items):
+        if not database_up.is_set():
+            raise Transient("connection refused")
+        batches.append(items)
+
+    w = writer(flush)
+    w.start()
+    pending = w.submit("row")
+    wait_until(lambda: w.failing)
+    database_up.set()
+
+    assert pending.wait(2)
+    assert batches == [["row"]]
+    assert not w.failing
+    assert w.retries >= 1
+    w.close()
+
+
+def test_bad_row_does_not_take_its_batch_down():
+    written = []
+
+    def flush(items):
+        if "bad" in items:
+            raise ValueError("constraint violation")
+        written.extend(items)
+
+    w = writer(flush)
+    pending = [w.submit(item) for item in ("a", "bad", "c")]
+    w.start()
+
+    assert [p.wait(2) for p in pending] == [True, False, True]
+    assert written == ["a", "c"]
+    assert isinstance(pending[1].error, ValueError)
+    w.close()
+    assert w.snapshot()["rows_failed"] == 1
+
+
+def test_close_flushes_rows_still_queued():
+    batches = []
+    w = writer(batches.append)
+    pending = [w.submit(i) for i in range(3)]
+
+    w.close()
+
+    assert all(p.wait(0) for p in pending)
+    assert batches == [[0, 1, 2]]
+
+
+def test_close_gives_up_on_a_failing_database_at_its_deadline():
+    def flush(items):
+        raise Transient("connection refused")
+
+    w = writer(flush)
+    pending = [w.submit(i) for i in range(3)]
+
+    w.close(timeout=0.05)
+
+    assert [p.wait(0) for p in pending] == [False, False, False]
+    snapshot = w.snapshot()
+    assert snapshot["rows_failed"] == 3
+    assert snapshot["rows_dropped_at_shutdown"] == 3
+
+
+def test_submit_after_close_is_refused():
+    w = writer(lambda items: None)
+    w.close()
+    with pytest.raises(QueueFullError):
+        w.submit("row")
+
+
+def test_full_queue_pushes_back():
+    w = writer(lambda items: None, max_queue=1, enqueue_timeout=0.01)
+    w.submit("first")
+    with pytest.raises(QueueFullError):
+        w.submit("second")
+    assert w.snapshot()["rejected"] == 1
+    w.close()
@@ -0,0 +1,114 @@
+"""
+Per-request phase timing.
+
+begin() binds a RequestTimer to the current request. Code on the request's
+path then reports spans with record() or span(): DB checkout, each query,
+the fraud call, JSON encoding. Outside a request, or in threads the request
+hands work to, there is no timer and both are no-ops. The timer lives in a
+ContextVar, so it follows the request's own thread or greenlet.
+
+A timer keeps a running total per phase for the Server-Timing header, and
+the first `max_spans` spans in order for the trace of a slow request. The
+trace is only built when it is wanted, so a fast request pays for a
+perf_counter() call and a list append per span.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current = ContextVar("request_timer", default=None)
+
+# Longest statement text kept per query span in a trace
+TRACE_STATEMENT_CHARS = 200
+
+
+class RequestTimer:
+
+    __slots__ = ("start", "max_spans", "phases", "spans", "dropped")
+
+    def __init__(self, max_spans=200):
+        self.start = time.perf_counter()
+        self.max_spans = max_spans
+        # name -> [count, seconds], in first-seen order
+        self.phases = {}
+        # (name, end perf_counter, seconds, detail)
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, name, seconds, detail=None):
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [1, seconds]
+        else:
+            phase[0] += 1
+            phase[1] += seconds
+        if len(self.spans) < self.max_spans:
+            self.spans.append((name, time.perf_counter(), seconds, detail))
+        else:
+            self.dropped += 1
+
+    def server_timing(self, total):
+        """Server-Timing header value: one metric per phase, plus total"""
+        parts = []
+        for name, (count, seconds) in self.phases.items():
+            if count > 1:
+                parts.append(f'{name};dur={seconds * 1000:.2f};desc="{count}x"')
+            else:
+                parts.append(f"{name};dur={seconds * 1000:.2f}")
+        parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+    def trace(self, total):
+        """Phase totals and individual spans, times in ms from the start of the request"""
+        phases = {name: {"count": count, "duration_ms": round(seconds * 1000, 3)}
+                  for name, (count, seconds) in self.phases.items()}
+        spans = []
+        for name, end, seconds, detail in self.spans:
+            span = {"name": name, "start_ms": round((end - seconds - self.start) * 1000, 3),
+                    "duration_ms": round(seconds * 1000, 3)}
+            if detail:
+                span["detail"] = " ".join(str(detail).split())[:TRACE_STATEMENT_CHARS]
+            spans.append(span)
+        tracked = sum(seconds for _, seconds in self.phases.values())
+        return {
+            "duration_ms": round(total * 1000, 3),
+            "untracked_ms": round(max(total - tracked, 0) * 1000, 3),
+            "phases": phases,
+            "spans": spans,
+            "spans_dropped": self.dropped,
+        }
+
+
+def begin(max_spans=200):
+    """Start timing the current request; pass the result to end()"""
+    timer = RequestTimer(max_spans)
+    return timer, _current.set(timer)
+
+
+def end(started):
+    _current.reset(started[1])
+
+
+def current():
+    return _current.get()
+
+
+def record(name, seconds, detail=None):
+    """Add a span that already ended, e.g. from a hook that measured it"""
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds, detail)
+
+
+@contextmanager
+def span(name, detail=None):
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start, detail)
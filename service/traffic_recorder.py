@@ -0,0 +1,64 @@
+"""
+Sampled request recording for replay by the traffic generator.
+
+A sampled request costs the request thread one random() call and a
+non-blocking queue put; serialisation and file writes happen on a background
+BatchWriter thread. When the queue is full entries are dropped, never waited
+for. Each line of the output is one JSON object:
+
+    {"ts": 1700000000.123, "method": "POST", "path": "/api/payment", "route": "/api/payment",
+     "body": {...}, "status": 200, "duration_ms": 12.3}
+"""
+
+import os
+import json
+import random
+import logging
+
+import write_behind
+
+logger = logging.getLogger(__name__)
+
+
+class TrafficRecorder:
+
+    def __init__(self, path, sample_rate=1.0, max_queue=10000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.writer = write_behind.BatchWriter(
+            "traffic-record",
+            self._append,
+            max_batch=500,
+            max_delay=0.5,
+            max_queue=max_queue,
+            enqueue_timeout=0,
+        )
+
+    def record(self, entry):
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        try:
+            self.writer.submit(entry)
+        except write_behind.QueueFullError:
+            pass  # counted in writer.rejected
+
+    def _append(self, entries):
+        data = "".join(json.dumps(e, separators=(',', ':'), default=str) + "\n" for e in entries).encode()
+        # One O_APPEND write per batch so lines from several workers sharing the file never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def start(self):
+        self.writer.start()
+
+    def close(self):
+        self.writer.close()
+
+    def snapshot(self):
+        stats = self.writer.snapshot()
+        stats["path"] = self.path
+        stats["sample_rate"] = self.sample_rate
+        return stats
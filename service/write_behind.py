@@ -0,0 +1,290 @@
+"""
+Write-behind batching for database inserts.
+
+Request threads hand rows to a BatchWriter, which queues them and has a
+background thread flush them in batches: one flush call (and one commit) per
+`max_batch` rows or per `max_delay` seconds, whichever comes first.
+
+Callers have usually acknowledged the rows already, so a failure the
+`transient` classifier recognises (the database unreachable, a pool timeout)
+never drops rows. The writer holds on to the batch and retries it with
+exponential backoff until it goes through. Meanwhile `failing` is set, so
+callers can refuse new work, and the queue fills up and pushes back through
+QueueFullError. Rows are only given up on when close() runs out of time.
+"""
+
+import time
+import queue
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """The write queue stayed full for longer than the enqueue timeout"""
+
+
+class PendingWrite:
+    """Handle for a queued row; wait() blocks until its batch has been committed"""
+
+    __slots__ = ('item', 'enqueued_at', 'error', '_done')
+
+    def __init__(self, item):
+        self.item = item
+        self.enqueued_at = time.monotonic()
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Return True once the row is committed, False on failure or timeout"""
+        if not self._done.wait(timeout):
+            return False
+        return self.error is None
+
+    def _finish(self, error=None):
+        self.error = error
+        self._done.set()
+
+
+class BatchWriter:
+    """
+    Bounded queue drained by a background thread into `flush_fn(items)`.
+
+    flush_fn must write and commit the whole list or raise. A batch failing
+    with an error transient(error) accepts is retried whole after a backoff,
+    from `retry_delay` doubling up to `max_retry_delay`. Any other failure is
+    retried row by row, so a single bad row cannot take its neighbours with it.
+    """
+
+    def __init__(self, name, flush_fn, max_batch=200, max_delay=0.005,
+                 max_queue=10000, enqueue_timeout=0.05, transient=None,
+                 retry_delay=0.1, max_retry_delay=5.0):
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.enqueue_timeout = enqueue_timeout
+        self.transient = transient or (lambda error: False)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        # Set by close(); retries stop once it passes
+        self._deadline = None
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        # Of rows_failed, those given up on at close() while a transient failure was still being retried
+        self.rows_dropped_at_shutdown = 0
+        self.rejected = 0
+        self.batch_size_last = 0
+        self.batch_size_max = 0
+        self.flush_total = 0.0
+        self.flush_last = 0.0
+        self.flush_max = 0.0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.retries = 0
+        self.failing_since = None
+        self.last_error = None
+
+    @property
+    def failing(self):
+        """True while the last write attempt failed with a transient error and is being retried"""
+        return self.failing_since is not None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, item):
+        """Queue item for the next batch, raising QueueFullError under backpressure"""
+        if self._stopping.is_set():
+            raise QueueFullError(f"{self.name} writer is shutting down")
+        pending = PendingWrite(item)
+        try:
+            self._queue.put(pending, timeout=self.enqueue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(f"{self.name} write queue full ({self._queue.maxsize} rows)")
+        return pending
+
+    def close(self, timeout=10.0):
+        """Stop accepting rows and flush everything already queued, retrying for at most timeout"""
+        self._deadline = time.monotonic() + timeout
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Anything left (writer thread never started or join timed out) is flushed inline
+        remaining = self._drain(self._queue.qsize())
+        if remaining:
+            self._flush(remaining)
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    batch.extend(self._drain(self.max_batch - len(batch)))
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._flush(batch)
+
+    def _flush(self, batch):
+        start = time.monotonic()
+        failed = self._write(batch)
+        for p, err in failed:
+            p._finish(err)
+
+        end = time.monotonic()
+        duration = end - start
+        lag = end - batch[0].enqueued_at
+        with self._lock:
+            self.batches += 1
+            self.rows_written += len(batch) - len(failed)
+            self.rows_failed += len(failed)
+            self.batch_size_last = len(batch)
+            self.batch_size_max = max(self.batch_size_max, len(batch))
+            self.flush_total += duration
+            self.flush_last = duration
+            self.flush_max = max(self.flush_max, duration)
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+
+    def _write(self, batch):
+        """Write batch, retrying transient failures; [(pending, error)] for rows that failed for good"""
+        delay = self.retry_delay
+        failed = []
+        row_by_row = False
+        while batch:
+            if row_by_row:
+                batch, error = self._write_rows(batch, failed)
+            else:
+                try:
+                    self.flush_fn([p.item for p in batch])
+                except Exception as e:
+                    error = e
+                else:
+                    for p in batch:
+                        p._finish()
+                    batch, error = [], None
+            if error is None:
+                self._recovered()
+                break
+            if self.transient(error):
+                if not self._wait_to_retry(error, delay, len(batch)):
+                    failed.extend((p, error) for p in batch)
+                    with self._lock:
+                        self.rows_dropped_at_shutdown += len(batch)
+                    break
+                delay = min(delay * 2, self.max_retry_delay)
+            elif len(batch) == 1:
+                logger.error("%s row dropped: %s", self.name, error)
+                failed.append((batch[0], error))
+                break
+            else:
+                logger.error("%s batch of %s failed, retrying rows individually: %s", self.name, len(batch), error)
+                row_by_row = True
+        return failed
+
+    def _write_rows(self, batch, failed):
+        """
+        Write rows one at a time, adding bad rows to failed. Returns the rows
+        left and the error when a transient failure interrupts, else ([], None).
+        """
+        for i, p in enumerate(batch):
+            try:
+                self.flush_fn([p.item])
+            except Exception as e:
+                if self.transient(e):
+                    return batch[i:], e
+                logger.error("%s row dropped: %s", self.name, e)
+                failed.append((p, e))
+            else:
+                p._finish()
+        return [], None
+
+    def _wait_to_retry(self, error, delay, rows):
+        """Sleep before retrying; False once close()'s deadline leaves no time for it"""
+        self._note_failure(error)
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error("%s giving up on %s rows at shutdown: %s", self.name, rows, error)
+                return False
+            delay = min(delay, remaining)
+        logger.warning("%s write of %s rows failed, retrying in %.1fs: %s", self.name, rows, delay, error)
+        time.sleep(delay)
+        return True
+
+    def _note_failure(self, error):
+        with self._lock:
+            self.retries += 1
+            self.last_error = str(error)
+            if self.failing_since is None:
+                self.failing_since = time.monotonic()
+
+    def _recovered(self):
+        if self.failing_since is None:
+            return
+        with self._lock:
+            outage = time.monotonic() - self.failing_since
+            self.failing_since = None
+        logger.info("%s writes recovered after %.1fs", self.name, outage)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self._queue.maxsize,
+                "max_batch": self.max_batch,
+                "max_delay_ms": self.max_delay * 1000,
+                "batches": self.batches,
+                "rows_written": self.rows_written,
+                "rows_failed": self.rows_failed,
+                "rows_dropped_at_shutdown": self.rows_dropped_at_shutdown,
+                "rejected": self.rejected,
+                "batch_size_avg": round((self.rows_written + self.rows_failed) / self.batches, 2) if self.batches else 0.0,
+                "batch_size_last": self.batch_size_last,
+                "batch_size_max": self.batch_size_max,
+                "flush_avg_ms": round(self.flush_total / self.batches * 1000, 3) if self.batches else 0.0,
+                "flush_last_ms": round(self.flush_last * 1000, 3),
+                "flush_max_ms": round(self.flush_max * 1000, 3),
+                "lag_last_ms": round(self.lag_last * 1000, 3),
+                "lag_max_ms": round(self.lag_max * 1000, 3),
+                "failing": self.failing_since is not None,
+                "failing_seconds": round(time.monotonic() - self.failing_since, 3) if self.failing_since is not None else 0.0,
+                "retries": self.retries,
+                "last_error": self.last_error,
+                "running": self._thread is not None and self._thread.is_alive(),
+            }
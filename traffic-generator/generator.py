@@ -4,10 +4,13 @@ Traffic generator to simulate realistic application load.
 Generates a mix of successful requests (read operations) and failing requests (payments).
 """
 
+import os
+import sys
 import requests
 import time
 import random
 import logging
+import collections
 from datetime import datetime
 
 logging.basicConfig(
@@ -16,12 +19,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-BASE_URL = "http://payment-processor:8080"
+BASE_URL = os.getenv("BASE_URL", "http://payment-processor:8080")
 
 # Customer IDs from the database
 CUSTOMER_IDS = ["cust_001", "cust_002", "cust_003", "cust_004", "cust_005", "cust_123"]
 TRANSACTION_IDS = ["txn_001", "txn_002", "txn_003", "txn_004", "txn_005"]
 
+# Payments above the service's refund fraud-check threshold that this process made and has not
+# refunded yet. A payment can only be refunded once, so each one is handed out for one refund.
+REFUND_FRAUD_CHECK_AMOUNT = 1000
+refundable_payments = collections.deque(maxlen=100)
+
+def remember_payment(endpoint, json_data, response):
+    """Queue a successful large payment for the refund share of the mix"""
+    if endpoint != "/api/payment" or response.status_code != 200:
+        return
+    # Replayed payments carry whatever body was recorded
+    amount = json_data.get("amount") if isinstance(json_data, dict) else None
+    if not isinstance(amount, (int, float)) or amount <= REFUND_FRAUD_CHECK_AMOUNT:
+        return
+    try:
+        refundable_payments.append(response.json()["transaction_id"])
+    except (ValueError, KeyError):
+        pass
+
 def make_request(method, endpoint, json_data=None, description=""):
     """Make HTTP request and log result"""
     try:
@@ -30,6 +51,7 @@ def make_request(method, endpoint, json_data=None, description=""):
             response = requests.get(url, timeout=5)
         elif method == "POST":
             response = requests.post(url, json=json_data, timeout=5)
+            remember_payment(endpoint, json_data, response)
         
         status = "✓" if response.status_code < 400 else "✗"
         logger.info(f"{status} {method} {endpoint} → {response.status_code} ({description})")
@@ -44,100 +66,105 @@ def make_request(method, endpoint, json_data=None, description=""):
         logger.error(f"✗ {method} {endpoint} → ERROR: {str(e)} ({description})")
         return None
 
-def generate_traffic():
-    """Generate realistic traffic patterns"""
-    logger.info("Traffic generator started")
+def next_request():
+    """
+    Pick the next request from the weighted traffic mix.
+    Returns (method, endpoint, json_data, description, name); name is the
+    route without its IDs, for grouping results.
+    """
+    # Weighted random selection of operations (realistic traffic pattern)
+    # 70% reads, 20% payments, 10% other writes
+    rand = random.random()
     
-    # Wait for service to be ready
+    if rand < 0.25:
+        # Get customer details
+        customer_id = random.choice(CUSTOMER_IDS)
+        return "GET", f"/api/customers/{customer_id}", None, "fetch customer", "GET /api/customers/{id}"
+        
+    elif rand < 0.45:
+        # List transactions
+        limit = random.choice([5, 10, 20])
+        return "GET", f"/api/transactions?limit={limit}", None, "list transactions", "GET /api/transactions"
+        
+    elif rand < 0.55:
+        # Get transaction details
+        txn_id = random.choice(TRANSACTION_IDS)
+        return "GET", f"/api/transactions/{txn_id}", None, "get transaction", "GET /api/transactions/{id}"
+        
+    elif rand < 0.65:
+        # Get account balance
+        customer_id = random.choice(CUSTOMER_IDS)
+        return "GET", f"/api/accounts/{customer_id}/balance", None, "check balance", "GET /api/accounts/{id}/balance"
+        
+    elif rand < 0.70:
+        # Get payment methods
+        customer_id = random.choice(CUSTOMER_IDS)
+        return "GET", f"/api/payment-methods/{customer_id}", None, "get payment methods", "GET /api/payment-methods/{id}"
+        
+    elif rand < 0.75:
+        # Get stats
+        return "GET", "/api/stats", None, "fetch stats", "GET /api/stats"
+        
+    elif rand < 0.92:
+        # Process payment (THIS WILL FAIL)
+        customer_id = random.choice(CUSTOMER_IDS)
+        amount = random.randint(10, 500)
+        payload = {
+            "customer_id": customer_id,
+            "amount": amount,
+            "currency": "USD"
+        }
+        return "POST", "/api/payment", payload, f"payment ${amount}", "POST /api/payment"
+        
+    elif rand < 0.97:
+        # Process refund for large amount (THIS WILL FAIL)
+        try:
+            txn_id = refundable_payments.popleft()
+        except IndexError:
+            # Nothing left to refund: make a large payment to refund later
+            amount = random.randint(REFUND_FRAUD_CHECK_AMOUNT + 1, 2000)
+            payload = {"customer_id": random.choice(CUSTOMER_IDS), "amount": amount, "currency": "USD"}
+            return "POST", "/api/payment", payload, f"large payment ${amount}", "POST /api/payment"
+        return "POST", "/api/refund", {"transaction_id": txn_id}, f"refund {txn_id}", "POST /api/refund"
+        
+    else:
+        # Create customer (occasional)
+        timestamp = int(time.time())
+        payload = {
+            "name": f"Generated User {timestamp}",
+            "email": f"user{timestamp}@example.com"
+        }
+        return "POST", "/api/customers", payload, "create customer", "POST /api/customers"
+
+def wait_for_service():
+    """Poll /health until the payment processor is ready; False if it never is"""
     logger.info("Waiting for payment-processor to be ready...")
     for i in range(30):
         try:
             response = requests.get(f"{BASE_URL}/health", timeout=2)
             if response.status_code == 200:
                 logger.info("Payment processor is ready!")
-                break
+                return True
         except:
             pass
         time.sleep(2)
-    else:
-        logger.error("Payment processor did not become ready in time")
+    logger.error("Payment processor did not become ready in time")
+    return False
+
+def generate_traffic():
+    """Generate realistic traffic patterns"""
+    logger.info("Traffic generator started")
+    
+    # Wait for service to be ready
+    if not wait_for_service():
         return
     
     request_count = 0
     
     while True:
         request_count += 1
-        
-        # Weighted random selection of operations (realistic traffic pattern)
-        # 70% reads, 20% payments, 10% other writes
-        rand = random.random()
-        
-        if rand < 0.25:
-            # Get customer details
-            customer_id = random.choice(CUSTOMER_IDS)
-            make_request("GET", f"/api/customers/{customer_id}", description="fetch customer")
-            
-        elif rand < 0.45:
-            # List transactions
-            limit = random.choice([5, 10, 20])
-            make_request("GET", f"/api/transactions?limit={limit}", description="list transactions")
-            
-        elif rand < 0.55:
-            # Get transaction details
-            txn_id = random.choice(TRANSACTION_IDS)
-            make_request("GET", f"/api/transactions/{txn_id}", description="get transaction")
-            
-        elif rand < 0.65:
-            # Get account balance
-            customer_id = random.choice(CUSTOMER_IDS)
-            make_request("GET", f"/api/accounts/{customer_id}/balance", description="check balance")
-            
-        elif rand < 0.70:
-            # Get payment methods
-            customer_id = random.choice(CUSTOMER_IDS)
-            make_request("GET", f"/api/payment-methods/{customer_id}", description="get payment methods")
-            
-        elif rand < 0.75:
-            # Get stats
-            make_request("GET", "/api/stats", description="fetch stats")
-            
-        elif rand < 0.92:
-            # Process payment (THIS WILL FAIL)
-            customer_id = random.choice(CUSTOMER_IDS)
-            amount = random.randint(10, 500)
-            make_request(
-                "POST", 
-                "/api/payment",
-                json_data={
-                    "customer_id": customer_id,
-                    "amount": amount,
-                    "currency": "USD"
-                },
-                description=f"payment ${amount}"
-            )
-            
-        elif rand < 0.97:
-            # Process refund for large amount (THIS WILL FAIL)
-            txn_id = random.choice(["txn_005"])  # Only txn_005 is > $1000
-            make_request(
-                "POST",
-                "/api/refund",
-                json_data={"transaction_id": txn_id},
-                description=f"refund {txn_id}"
-            )
-            
-        else:
-            # Create customer (occasional)
-            timestamp = int(time.time())
-            make_request(
-                "POST",
-                "/api/customers",
-                json_data={
-                    "name": f"Generated User {timestamp}",
-                    "email": f"user{timestamp}@example.com"
-                },
-                description="create customer"
-            )
+        method, endpoint, json_data, description, _ = next_request()
+        make_request(method, endpoint, json_data=json_data, description=description)
         
         # Log summary every 50 requests
         if request_count % 50 == 0:
@@ -149,6 +176,10 @@ def generate_traffic():
         time.sleep(delay)
 
 if __name__ == "__main__":
+    # `python generator.py replay traffic.jsonl --speed 10` replays a recorded traffic log
+    if len(sys.argv) > 1 and sys.argv[1] == "replay":
+        import loadgen
+        sys.exit(loadgen.main(["--replay"] + sys.argv[2:]))
     try:
         generate_traffic()
     except KeyboardInterrupt:
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator for the payment processor.
+
+Unlike generator.py, which waits for each response before sleeping and
+sending the next one, requests here are scheduled at a target arrival rate
+and handed to a worker pool whether or not earlier ones have finished. Latency
+is measured from each request's *scheduled* send time, so time spent queued
+behind a slow server is counted instead of hidden (coordinated omission).
+
+Uses the same weighted endpoint mix as generator.py:
+
+    python loadgen.py --profile constant --rate 50 --duration 60
+    python loadgen.py --profile ramp --rate 10 --peak 200 --duration 120
+    python loadgen.py --profile step --rate 20 --step 20 --step-every 15 --duration 90
+    python loadgen.py --profile spike --rate 20 --peak 300 --spike-at 30 --spike-length 10 --duration 60
+
+or replays a traffic log recorded by the service (TRAFFIC_RECORD_PATH) with
+its original inter-arrival times, optionally compressed:
+
+    python loadgen.py --replay traffic.jsonl --speed 10
+
+All requests come from one address, so the service rate-limits them as one
+client (100/min per route and worker by default). For capacity runs start the
+service with RATE_LIMIT_PER_MINUTE=0, or high enough for the target rate.
+"""
+
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Importing generator also sets up logging
+from generator import BASE_URL, next_request, remember_payment, wait_for_service
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50.0, 95.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of latencies in microseconds.
+
+    Values below 2048us are recorded exactly; above that every power of two is
+    split into 1024 sub-buckets, so any recorded value is reported to within
+    0.1%. Counts are kept sparsely in a dict.
+    """
+
+    SUB_BUCKETS = 1024
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        if value < 2 * self.SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - 11
+        return 2 * self.SUB_BUCKETS + (shift - 1) * self.SUB_BUCKETS + (value >> shift) - self.SUB_BUCKETS
+
+    def _highest_value(self, index):
+        """Largest value that falls into bucket `index`"""
+        if index < 2 * self.SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index - 2 * self.SUB_BUCKETS, self.SUB_BUCKETS)
+        shift += 1
+        return ((sub + self.SUB_BUCKETS + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = max(int(seconds * 1_000_000), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, p):
+        """Latency in seconds at percentile p (0-100)"""
+        if not self.total:
+            return 0.0
+        target = max(int(self.total * p / 100.0 + 0.5), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._highest_value(index), self.max) / 1_000_000
+        return self.max / 1_000_000
+
+
+class EndpointStats:
+
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+
+    def record(self, status, seconds):
+        self.requests += 1
+        self.latency.record(seconds)
+        key = str(status) if status is not None else "no_response"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        # Same rule as generator.py: anything that is not a < 400 response counts as a failure
+        if status is None or status >= 400:
+            self.errors += 1
+
+
+# Arrival-rate profiles: each returns requests/second at `t` seconds into the run
+
+def constant_profile(args):
+    return lambda t: args.rate
+
+def ramp_profile(args):
+    return lambda t: args.rate + (args.peak - args.rate) * min(t / args.duration, 1.0)
+
+def step_profile(args):
+    ceiling = args.peak if args.peak is not None else float('inf')
+    return lambda t: min(args.rate + args.step * int(t // args.step_every), ceiling)
+
+def spike_profile(args):
+    return lambda t: args.peak if args.spike_at <= t < args.spike_at + args.spike_length else args.rate
+
+PROFILES = {
+    "constant": constant_profile,
+    "ramp": ramp_profile,
+    "step": step_profile,
+    "spike": spike_profile,
+}
+
+
+# Schedules yield (offset_seconds, method, endpoint, json_data, name) in offset order
+
+def profile_schedule(rate_at, duration, poisson=False):
+    """Requests from the generator.py mix at the rate given by `rate_at`"""
+    t = 0.0
+    while t < duration:
+        rate = rate_at(t)
+        if rate <= 0:
+            t += 0.01
+            continue
+        method, endpoint, json_data, _, name = next_request()
+        yield t, method, endpoint, json_data, name
+        t += random.expovariate(rate) if poisson else 1.0 / rate
+
+def load_recording(path):
+    """Entries of a recorded traffic log, oldest first (workers append out of order)"""
+    entries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    entries.sort(key=lambda e: e["ts"])
+    return entries
+
+def replay_schedule(entries, speed=1.0):
+    """Recorded requests at their original spacing, divided by `speed`"""
+    if not entries:
+        return
+    first = entries[0]["ts"]
+    for entry in entries:
+        name = f"{entry['method']} {entry.get('route') or entry['path']}"
+        yield (entry["ts"] - first) / speed, entry["method"], entry["path"], entry.get("body"), name
+
+
+class LoadRun:
+    """Sends requests at the times a schedule gives and collects per-endpoint stats"""
+
+    def __init__(self, workers, timeout):
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="load")
+        self.workers = workers
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.scheduled = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.dispatch_lag_max = 0.0
+        self.elapsed = 0.0
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_maxsize=1, max_retries=0))
+        return session
+
+    def _send(self, intended, method, endpoint, json_data, name):
+        status = None
+        try:
+            response = self._session().request(method, f"{BASE_URL}{endpoint}", json=json_data, timeout=self.timeout)
+            status = response.status_code
+            remember_payment(endpoint, json_data, response)
+        except requests.exceptions.RequestException:
+            pass
+        # Measured from when the request should have gone out, not from when a worker picked it up
+        latency = time.perf_counter() - intended
+        with self._lock:
+            self.in_flight -= 1
+            self.stats.setdefault(name, EndpointStats()).record(status, latency)
+
+    def run(self, schedule):
+        start = time.perf_counter()
+        for offset, method, endpoint, json_data, name in schedule:
+            intended = start + offset
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.dispatch_lag_max = max(self.dispatch_lag_max, -delay)
+            with self._lock:
+                self.scheduled += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.executor.submit(self._send, intended, method, endpoint, json_data, name)
+
+        self.executor.shutdown(wait=True)
+        self.elapsed = time.perf_counter() - start
+
+    def report(self):
+        """Per-endpoint and overall throughput, error rate and latency percentiles"""
+        total = EndpointStats()
+        endpoints = {}
+        for name, stats in sorted(self.stats.items()):
+            endpoints[name] = self._summarise(stats)
+            total.requests += stats.requests
+            total.errors += stats.errors
+            for index, count in stats.latency.counts.items():
+                total.latency.counts[index] = total.latency.counts.get(index, 0) + count
+            total.latency.total += stats.latency.total
+            total.latency.max = max(total.latency.max, stats.latency.max)
+            for status, count in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + count
+        return {
+            "duration_seconds": round(self.elapsed, 3),
+            "scheduled": self.scheduled,
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "max_dispatch_lag_ms": round(self.dispatch_lag_max * 1000, 2),
+            "endpoints": endpoints,
+            "total": self._summarise(total),
+        }
+
+    def _summarise(self, stats):
+        summary = {
+            "requests": stats.requests,
+            "throughput_rps": round(stats.requests / self.elapsed, 2) if self.elapsed else 0.0,
+            "error_rate": round(stats.errors / stats.requests, 4) if stats.requests else 0.0,
+            "statuses": stats.statuses,
+        }
+        for p in PERCENTILES:
+            summary[f"p{p:g}_ms"] = round(stats.latency.percentile(p) * 1000, 2)
+        summary["max_ms"] = round(stats.latency.max / 1000, 2)
+        return summary
+
+
+def print_report(report):
+    columns = ["requests", "throughput_rps", "error_rate"] + [f"p{p:g}_ms" for p in PERCENTILES] + ["max_ms"]
+    header = f"{'endpoint':<34}" + "".join(f"{c:>15}" for c in columns)
+    print(header)
+    print("-" * len(header))
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, summary in rows:
+        print(f"{name:<34}" + "".join(f"{summary[c]:>15}" for c in columns))
+    print(f"\n{report['scheduled']} requests scheduled over {report['duration_seconds']}s, "
+          f"{report['workers']} workers, max {report['max_in_flight']} in flight")
+    if report["max_dispatch_lag_ms"] > 100:
+        print(f"Dispatcher fell up to {report['max_dispatch_lag_ms']}ms behind schedule: "
+              "this client could not keep up, so results understate the target rate")
+    if report["max_in_flight"] >= report["workers"]:
+        print("Worker pool was saturated: latencies include time queued for a worker (that is intended)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the payment processor")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="constant")
+    parser.add_argument("--rate", type=float, default=20.0, help="requests/second (starting rate for ramp/step)")
+    parser.add_argument("--peak", type=float,
+                        help="ramp end rate or spike rate (required for both), or step ceiling (default: none)")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--step", type=float, default=10.0, help="rate increase per step")
+    parser.add_argument("--step-every", type=float, default=10.0, help="seconds between steps")
+    parser.add_argument("--spike-at", type=float, default=20.0, help="seconds into the run")
+    parser.add_argument("--spike-length", type=float, default=10.0, help="seconds")
+    parser.add_argument("--replay", metavar="PATH", help="replay a recorded traffic log instead of a profile")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay time compression, e.g. 2 or 10")
+    parser.add_argument("--poisson", action="store_true", help="exponential inter-arrival times instead of even spacing")
+    parser.add_argument("--workers", type=int, default=200, help="maximum concurrent requests")
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-request timeout, seconds")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON to PATH")
+    parser.add_argument("--no-wait", action="store_true", help="do not wait for /health before starting")
+    args = parser.parse_args(argv)
+    if not args.replay:
+        if args.profile in ("ramp", "spike") and args.peak is None:
+            parser.error(f"--profile {args.profile} requires --peak")
+        if args.peak is not None and args.peak < args.rate:
+            parser.error(f"--peak ({args.peak:g}) must be at least --rate ({args.rate:g})")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.no_wait and not wait_for_service():
+        return 1
+
+    run = LoadRun(args.workers, args.timeout)
+    if args.replay:
+        entries = load_recording(args.replay)
+        logger.info(f"Replaying {len(entries)} requests from {args.replay} at {args.speed:g}x against {BASE_URL}")
+        run.run(replay_schedule(entries, args.speed))
+    else:
+        logger.info(f"Starting {args.profile} load against {BASE_URL} for {args.duration:g}s")
+        run.run(profile_schedule(PROFILES[args.profile](args), args.duration, args.poisson))
+
+    report = run.report()
+    report["profile"] = f"replay {args.replay} x{args.speed:g}" if args.replay else args.profile
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())